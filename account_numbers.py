@@ -0,0 +1,86 @@
+import os
+import threading
+
+import storage
+
+# Account numbers are a 9 digit sequence value followed by a Luhn check
+# digit. Processes reserve blocks of the sequence from bank.db and then
+# hand numbers out from memory, so allocation costs one UPDATE per block
+# rather than one round trip (or one collision risk) per registration.
+SEQUENCE_NAME = 'account_number'
+SEQUENCE_START = 100000000
+SEQUENCE_END = 999999999
+
+
+def luhn_check_digit(digits):
+    """Luhn check digit for a string of digits"""
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = int(ch)
+        if i % 2 == 0:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return str((10 - total % 10) % 10)
+
+
+def create_sequence(conn):
+    """Create the sequence table, starting above any existing account number"""
+    conn.execute('''CREATE TABLE IF NOT EXISTS account_sequence (
+                    name TEXT PRIMARY KEY,
+                    next_value INTEGER NOT NULL)''')
+    # Older time-based account numbers are 10 digits too; start past their
+    # 9 digit prefixes so a new number can never equal an existing one
+    highest = conn.execute('''SELECT MAX(CAST(substr(account_number, 1, 9) AS INTEGER))
+                              FROM accounts WHERE account_number GLOB '[0-9]*' ''').fetchone()[0]
+    start = max(SEQUENCE_START, (highest or 0) + 1)
+    conn.execute("INSERT OR IGNORE INTO account_sequence (name, next_value) VALUES (?, ?)",
+                 (SEQUENCE_NAME, start))
+
+
+class AccountNumberAllocator:
+    """Thread- and process-safe allocator of Luhn-checked account numbers"""
+
+    def __init__(self, database, block_size=1000):
+        self.database = database
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+        self._pid = os.getpid()
+
+    def _reserve_block(self):
+        conn = storage.connect(self.database)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE account_sequence SET next_value = next_value + ? WHERE name = ?",
+                         (self.block_size, SEQUENCE_NAME))
+            row = conn.execute("SELECT next_value FROM account_sequence WHERE name = ?",
+                               (SEQUENCE_NAME,)).fetchone()
+            if row is None:
+                raise RuntimeError("account_sequence is missing; run the schema migrations")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        end = row[0]
+        if end - 1 > SEQUENCE_END:
+            raise RuntimeError("Account number sequence exhausted")
+        self._next, self._end = end - self.block_size, end
+
+    def allocate(self):
+        """Return a new, never before issued account number"""
+        with self._lock:
+            # A forked worker must not reuse its parent's block
+            if os.getpid() != self._pid:
+                self._pid = os.getpid()
+                self._next = self._end = 0
+            if self._next >= self._end:
+                self._reserve_block()
+            value = self._next
+            self._next += 1
+        digits = str(value)
+        return digits + luhn_check_digit(digits)
@@ -0,0 +1,255 @@
+import csv
+import json
+from functools import wraps
+
+import jwt
+from flask import Blueprint, Response, g, request
+
+import balances
+import bulk_transfers
+import history
+import money
+from passwords import PasswordServiceBusy
+from postings import AccountNotFound, PostingError, PostingFailed, open_account
+from tokens import TokenRevoked
+
+try:
+    import orjson
+except ImportError:  # optional, only makes serialization faster
+    orjson = None
+
+# Versioned JSON API for machine clients. Responses are serialized
+# directly (no templates, no redirects), GET responses carry an ETag so
+# clients can revalidate with If-None-Match, and requests authenticate
+# with the same JWTs as the CLI: "Authorization: Bearer <token>".
+API_PREFIX = '/api/v1'
+
+
+def dumps(obj):
+    """Compact JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def json_response(obj, status=200, headers=None):
+    response = Response(dumps(obj), status=status, mimetype='application/json', headers=headers)
+    if request.method == 'GET' and status == 200:
+        # Clients revalidate instead of re-downloading unchanged data
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
+def error(message, status, headers=None):
+    return json_response({'error': message}, status, headers)
+
+
+def rupees(paise):
+    """Amounts go out as exact decimal strings, e.g. "1234.50" """
+    return str(money.to_rupees(paise))
+
+
+def create_blueprint(get_db, tokens, passwords, pipeline, allocator, token_minutes=30, bulk=None):
+    """Blueprint serving the API from the app's shared services"""
+    bp = Blueprint('api', __name__, url_prefix=API_PREFIX)
+    bulk = bulk or bulk_transfers.BulkTransferEngine()
+
+    def token_required(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+            if scheme.lower() != 'bearer' or not token:
+                return error('Missing bearer token', 401, {'WWW-Authenticate': 'Bearer'})
+            try:
+                g.api_user = tokens.verify(token)
+            except jwt.ExpiredSignatureError:
+                return error('Token has expired', 401, {'WWW-Authenticate': 'Bearer error="invalid_token"'})
+            except TokenRevoked:
+                return error('Token has been revoked', 401, {'WWW-Authenticate': 'Bearer error="invalid_token"'})
+            except jwt.InvalidTokenError:
+                return error('Invalid token', 401, {'WWW-Authenticate': 'Bearer error="invalid_token"'})
+            g.api_token = token
+            return func(*args, **kwargs)
+        return wrapper
+
+    @bp.route('/tokens', methods=['POST'])
+    def create_token():
+        data = request.get_json(silent=True) or {}
+        username = data.get('username')
+        password = data.get('password')
+        if not username or not password:
+            return error('username and password are required', 400)
+
+        conn = get_db()
+        user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+        try:
+            ok, upgraded_hash = passwords.verify(user['password_hash'], password) if user else (False, None)
+        except PasswordServiceBusy as e:
+            return error(str(e), 503)
+        if not ok:
+            return error('Invalid username or password', 401)
+        if upgraded_hash:
+            conn.execute('UPDATE users SET password_hash = ? WHERE username = ? AND password_hash = ?',
+                         (upgraded_hash, user['username'], user['password_hash']))
+            conn.commit()
+
+        token = tokens.issue({'username': user['username'], 'account_number': user['account_number']},
+                             token_minutes)
+        return json_response({'token': token, 'token_type': 'Bearer',
+                              'expires_in': token_minutes * 60}, 201)
+
+    @bp.route('/tokens', methods=['DELETE'])
+    @token_required
+    def revoke_token():
+        tokens.revoke(g.api_token)
+        return Response(status=204)
+
+    @bp.route('/accounts', methods=['POST'])
+    def create_account():
+        data = request.get_json(silent=True) or {}
+        username = data.get('username')
+        password = data.get('password')
+        name = data.get('name')
+        if not username or not password or not name:
+            return error('username, password and name are required', 400)
+        try:
+            initial_deposit = money.parse_amount(data.get('initial_deposit', '0'))
+        except ValueError as e:
+            return error(str(e), 400)
+
+        conn = get_db()
+        if conn.execute('SELECT username FROM users WHERE username = ?', (username,)).fetchone():
+            return error('Username already exists', 409)
+        try:
+            password_hash = passwords.hash(password)
+        except PasswordServiceBusy as e:
+            return error(str(e), 503)
+
+        account_number = allocator.allocate()
+        open_account(conn, account_number, name, initial_deposit)
+        conn.execute('INSERT INTO users VALUES (?, ?, ?)', (username, account_number, password_hash))
+        conn.commit()
+        return json_response({'account_number': account_number, 'name': name,
+                              'balance': rupees(initial_deposit)}, 201,
+                             {'Location': f"{API_PREFIX}/accounts"})
+
+    @bp.route('/accounts', methods=['GET'])
+    @token_required
+    def get_account():
+        conn = get_db()
+        account = conn.execute('SELECT account_number, name, balance FROM accounts WHERE account_number = ?',
+                               (g.api_user['account_number'],)).fetchone()
+        if account is None:
+            return error('Account not found', 404)
+        return json_response({'account_number': account['account_number'],
+                              'name': account['name'],
+                              'balance': rupees(account['balance']),
+                              'username': g.api_user['username']})
+
+    @bp.route('/balance')
+    @token_required
+    def get_balance():
+        conn = get_db()
+        as_of = request.args.get('as_of')
+        if as_of:
+            # Historical balance, e.g. ?as_of=2024-03-31 (end of that day)
+            try:
+                as_of = balances.as_of_bound(as_of)
+            except ValueError:
+                return error('as_of must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS in UTC', 400)
+            paise = balances.balance_as_of(conn, g.api_user['account_number'], as_of)
+        else:
+            row = conn.execute('SELECT balance FROM accounts WHERE account_number = ?',
+                               (g.api_user['account_number'],)).fetchone()
+            paise = row['balance'] if row else None
+        if paise is None:
+            return error('Account not found', 404)
+        body = {'account_number': g.api_user['account_number'], 'balance': rupees(paise)}
+        if as_of:
+            body['as_of'] = as_of
+        return json_response(body)
+
+    @bp.route('/transactions')
+    @token_required
+    def list_transactions():
+        cursor = request.args.get('cursor')
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        try:
+            rows, next_cursor = history.fetch_page(get_db(), g.api_user['account_number'],
+                                                   cursor=cursor, limit=limit)
+        except ValueError as e:
+            return error(str(e), 400)
+        return json_response({
+            'transactions': [{'id': row['id'],
+                              'type': row['type'],
+                              'amount': rupees(row['amount']),
+                              'related_account': row['related_account'],
+                              'timestamp': row['timestamp']} for row in rows],
+            'next_cursor': next_cursor,
+        })
+
+    @bp.route('/transfers', methods=['POST'])
+    @token_required
+    def create_transfer():
+        data = request.get_json(silent=True) or {}
+        to_account = str(data.get('to_account') or '')
+        if not to_account:
+            return error('to_account is required', 400)
+        try:
+            amount = money.parse_amount(data.get('amount', ''))
+        except ValueError as e:
+            return error(str(e), 400)
+        if amount <= 0:
+            return error('Transfer amount must be positive', 400)
+        from_account = g.api_user['account_number']
+        if to_account == from_account:
+            return error('Cannot transfer to your own account', 400)
+
+        try:
+            new_balance = pipeline.transfer(from_account, to_account, amount).result()
+        except AccountNotFound as e:
+            return error(str(e), 404)
+        except PostingFailed as e:
+            return error(str(e), 503)
+        except PostingError as e:
+            return error(str(e), 422)
+        return json_response({'from_account': from_account, 'to_account': to_account,
+                              'amount': rupees(amount), 'balance': rupees(new_balance)}, 201)
+
+    @bp.route('/transfers/bulk', methods=['POST'])
+    @token_required
+    def create_bulk_transfer():
+        # JSON body, CSV body, or a CSV file uploaded as "file"
+        try:
+            if request.files.get('file'):
+                lines = bulk_transfers.parse_csv(request.files['file'].read().decode('utf-8-sig'))
+            elif request.mimetype == 'text/csv':
+                lines = bulk_transfers.parse_csv(request.get_data(as_text=True))
+            else:
+                lines = bulk_transfers.parse_json(request.get_json(silent=True))
+        except (bulk_transfers.BulkTransferError, UnicodeDecodeError, csv.Error) as e:
+            return error(str(e), 400)
+        if not lines:
+            return error('No transfers given', 400)
+
+        # The whole batch is one posting in the write pipeline
+        try:
+            report = pipeline.submit(bulk.apply, g.api_user['account_number'], lines).result()
+        except bulk_transfers.BulkTransferError as e:
+            return error(str(e), 400)
+        except AccountNotFound as e:
+            return error(str(e), 404)
+        except PostingFailed as e:
+            return error(str(e), 503)
+        except PostingError as e:
+            return error(str(e), 422)
+        report['total'] = rupees(report['total'])
+        report['balance'] = rupees(report['balance'])
+        for result in report['results']:
+            if result['amount'] is not None:
+                result['amount'] = rupees(result['amount'])
+        return json_response(report, 201 if report['accepted'] else 422)
+
+    return bp
@@ -1,72 +1,106 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-import sqlite3
-import hashlib
-from datetime import datetime, timedelta, timezone
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, has_request_context
 import secrets
 import os
 
+from db_pool import ConnectionPool
+from templating import configure_templates, precompile_templates
+from account_numbers import AccountNumberAllocator
+from write_pipeline import WritePipeline
+from postings import PostingError, open_account
+from passwords import PasswordService, PasswordServiceBusy
+from tokens import TokenService
+import api
+import ratelimit
+from ratelimit import RateLimiter, Limit
+import storage
+import migrations
+import history
+import money
+import formatting
+import statements
+import metrics
+from slowlog import SlowQueryLog
+
+DATABASE = 'bank.db'
+
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(32)
 
+# Per-endpoint latency and SQL time, served at /metrics to holders of BANK_METRICS_TOKEN
+metrics.init_app(app)
+
+# Statements slower than BANK_SLOW_QUERY_MS are logged with their query plan
+metrics.log_slow_queries(SlowQueryLog(
+    os.environ.get('BANK_SLOW_QUERY_LOG', 'slow_queries.jsonl'),
+    threshold=float(os.environ.get('BANK_SLOW_QUERY_MS', 100)) / 1000,
+    context=lambda: request.endpoint if has_request_context() else None))
+
+# Templates ship with the app; compiled bytecode is cached on disk and
+# shared by every worker
+configure_templates(app, os.environ.get('BANK_TEMPLATE_CACHE'))
+
+# Connection pool shared by all requests
+db_pool = ConnectionPool(DATABASE,
+                         size=int(os.environ.get('BANK_DB_POOL_SIZE', 5)),
+                         timeout=float(os.environ.get('BANK_DB_POOL_TIMEOUT', 5.0)),
+                         on_connect=storage.configure_connection,
+                         factory=metrics.InstrumentedConnection)
+db_pool.init_app(app)
+
+account_numbers = AccountNumberAllocator(DATABASE)
+
+# Rate limits are shared by all worker processes through ratelimit.db
+limiter = RateLimiter(ratelimit.backend_from_env(default='sqlite'), limits={
+    'login': Limit(10, 60, 'sliding_window'),
+    'register': Limit(5, 3600, 'sliding_window'),
+    'deposit': Limit(10, 10),
+    'withdraw': Limit(10, 10),
+    'transfer': Limit(10, 10),
+    'api.create_token': Limit(10, 60, 'sliding_window'),
+    'api.create_account': Limit(5, 3600, 'sliding_window'),
+    'api.create_transfer': Limit(10, 10),
+    'api.create_bulk_transfer': Limit(5, 60),
+})
+limiter.init_app(app, key_func=lambda: session.get('account_number') or request.remote_addr)
+
+# Deposits, withdrawals and transfers are group-committed by one writer
+write_pipeline = WritePipeline(DATABASE, factory=metrics.InstrumentedConnection)
+
 # Database initialization
 def initialize_database():
-    conn = sqlite3.connect('bank.db')
-    cursor = conn.cursor()
-    
-    cursor.execute("DROP TABLE IF EXISTS transactions")
-    cursor.execute("DROP TABLE IF EXISTS users")
-    cursor.execute("DROP TABLE IF EXISTS accounts")
-    
-    cursor.execute('''CREATE TABLE accounts (
-                    account_number TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    balance REAL)''')
-    
-    cursor.execute('''CREATE TABLE users (
-                    username TEXT PRIMARY KEY,
-                    account_number TEXT UNIQUE,
-                    password_hash TEXT NOT NULL)''')
-    
-    cursor.execute('''CREATE TABLE transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    account_number TEXT,
-                    type TEXT,
-                    amount REAL,
-                    related_account TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)''')
-    
-    # Add sample data for testing
-    cursor.execute("INSERT INTO accounts VALUES ('1234567890', 'Test User', 10000.00)")
-    cursor.execute("INSERT INTO users VALUES ('test', '1234567890', ?)", 
-                  (hashlib.sha256('test123'.encode()).hexdigest(),))
-    
-    conn.commit()
-    conn.close()
+    # Applies pending schema migrations; existing data is kept
+    for version, description in migrations.initialize(DATABASE):
+        print(f"Applied migration {version}: {description}")
 
 # Helper functions
 def get_db_connection():
-    conn = sqlite3.connect('bank.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Returned to the pool when the app context tears down
+    return db_pool.get()
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+# Pool and pipeline state at scrape time
+metrics.REGISTRY.gauge('bank_db_pool_connections_in_use', "Pooled connections checked out",
+                       lambda: db_pool.stats()['in_use'])
+metrics.REGISTRY.gauge('bank_db_pool_wait_seconds_max', "Longest wait for a pooled connection",
+                       lambda: db_pool.stats()['wait_seconds_max'])
+metrics.REGISTRY.gauge('bank_write_pipeline_queued', "Postings waiting for the writer",
+                       lambda: write_pipeline.stats()['queued'])
+for key, help_text in (('conflicts', "Times BEGIN IMMEDIATE found the write lock held"),
+                       ('retries', "BEGIN IMMEDIATE retries after backing off"),
+                       ('retries_exhausted', "Batches failed because the write lock stayed busy"),
+                       ('lock_wait_seconds_total', "Time spent acquiring the write lock")):
+    metrics.REGISTRY.gauge(f'bank_transfer_engine_{key}', help_text,
+                           lambda key=key: write_pipeline.transfer_engine.stats()[key])
 
-# Custom filter for Indian number formatting
-@app.template_filter('indian_format')
-def indian_number_format(value):
-    value = float(value)
-    if value < 1000:
-        return "{:,.2f}".format(value)
-    else:
-        value = str(value).split('.')[0]
-        last_three = value[-3:]
-        other_numbers = value[:-3]
-        if other_numbers:
-            formatted = other_numbers[::-1].replace('', ',')[1:-1][::-1] + ',' + last_three
-        else:
-            formatted = last_three
-        return formatted
+# Password hashing runs in a process pool so the KDF doesn't stall request threads
+password_service = PasswordService(workers=int(os.environ.get('BANK_PASSWORD_WORKERS', os.cpu_count() or 1)))
+
+# JWTs for the JSON API; set BANK_JWT_SECRET when running several workers
+tokens = TokenService(os.environ.get('BANK_JWT_SECRET', app.secret_key), DATABASE)
+app.register_blueprint(api.create_blueprint(get_db_connection, tokens, password_service,
+                                            write_pipeline, account_numbers))
+
+# Custom filter for Indian number formatting (amounts are in paise)
+app.add_template_filter(formatting.format_indian, 'indian_format')
 
 # Routes
 @app.route('/')
@@ -83,9 +117,19 @@ def login():
         
         conn = get_db_connection()
         user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
         
-        if user and user['password_hash'] == hash_password(password):
+        try:
+            ok, upgraded_hash = password_service.verify(user['password_hash'], password) if user else (False, None)
+        except PasswordServiceBusy as e:
+            flash(str(e), 'danger')
+            return render_template('login.html')
+        
+        if ok:
+            if upgraded_hash:
+                # Transparently move legacy or outdated hashes to the current KDF
+                conn.execute('UPDATE users SET password_hash = ? WHERE username = ? AND password_hash = ?',
+                           (upgraded_hash, user['username'], user['password_hash']))
+                conn.commit()
             session['username'] = user['username']
             session['account_number'] = user['account_number']
             flash('Login successful!', 'success')
@@ -100,27 +144,34 @@ def register():
         username = request.form['username']
         password = request.form['password']
         name = request.form['name']
-        initial_deposit = float(request.form.get('initial_deposit', 0))
+        try:
+            initial_deposit = money.parse_amount(request.form.get('initial_deposit', '0'))
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('register'))
         
         conn = get_db_connection()
         
         # Check if username exists
         if conn.execute('SELECT username FROM users WHERE username = ?', (username,)).fetchone():
             flash('Username already exists', 'danger')
-            conn.close()
+            return redirect(url_for('register'))
+        
+        try:
+            password_hash = password_service.hash(password)
+        except PasswordServiceBusy as e:
+            flash(str(e), 'danger')
             return redirect(url_for('register'))
         
         # Create account
-        account_number = str(int(datetime.now().timestamp()))[-10:]
-        conn.execute('INSERT INTO accounts VALUES (?, ?, ?)', 
-                   (account_number, name, initial_deposit))
+        account_number = account_numbers.allocate()
+        open_account(conn, account_number, name, initial_deposit)
         
         # Create user
         conn.execute('INSERT INTO users VALUES (?, ?, ?)', 
-                   (username, account_number, hash_password(password)))
+                   (username, account_number, password_hash))
         
         conn.commit()
-        conn.close()
         
         flash(f'Registration successful! Your account number is {account_number}', 'success')
         return redirect(url_for('login'))
@@ -135,40 +186,77 @@ def dashboard():
     conn = get_db_connection()
     account = conn.execute('SELECT * FROM accounts WHERE account_number = ?', 
                          (session['account_number'],)).fetchone()
-    transactions = conn.execute('''SELECT * FROM transactions 
-                                WHERE account_number = ? 
-                                ORDER BY timestamp DESC LIMIT 5''',
-                              (session['account_number'],)).fetchall()
-    conn.close()
+    transactions, _ = history.fetch_page(conn, session['account_number'], limit=5)
     
     return render_template('dashboard.html', 
                          account=account, 
                          transactions=transactions)
 
+@app.route('/history')
+def transaction_history():
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    
+    cursor = request.args.get('cursor')
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    
+    conn = get_db_connection()
+    try:
+        transactions, next_cursor = history.fetch_page(conn, session['account_number'],
+                                                       cursor=cursor, limit=limit)
+    except ValueError:
+        flash('Invalid page link', 'danger')
+        return redirect(url_for('transaction_history'))
+    
+    return render_template('history.html',
+                         transactions=transactions,
+                         amounts=formatting.format_indian_batch(t['amount'] for t in transactions),
+                         next_cursor=next_cursor,
+                         first_page=cursor is None,
+                         limit=limit)
+
+@app.route('/statement')
+def statement():
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    
+    fmt = request.args.get('format', 'csv')
+    try:
+        start = statements.parse_date(request.args.get('from'))
+        end = statements.parse_date(request.args.get('to'))
+        statements.check_format(fmt)
+    except statements.StatementError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('transaction_history'))
+    
+    # Streamed in batches from its own connection; memory stays flat
+    account_number = session['account_number']
+    name = statements.filename(account_number, fmt, start, end)
+    return Response(statements.stream_statement(DATABASE, account_number, fmt, start, end),
+                    mimetype=statements.FORMATS[fmt][0],
+                    headers={'Content-Disposition': f'attachment; filename="{name}"'})
+
 @app.route('/deposit', methods=['POST'])
 def deposit():
     if 'username' not in session:
         return redirect(url_for('login'))
     
-    amount = float(request.form['amount'])
+    try:
+        amount = money.parse_amount(request.form['amount'])
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('dashboard'))
     if amount <= 0:
         flash('Deposit amount must be positive', 'danger')
         return redirect(url_for('dashboard'))
     
-    conn = get_db_connection()
-    
-    # Update balance
-    conn.execute('UPDATE accounts SET balance = balance + ? WHERE account_number = ?',
-               (amount, session['account_number']))
-    
-    # Record transaction
-    conn.execute('INSERT INTO transactions (account_number, type, amount) VALUES (?, ?, ?)',
-               (session['account_number'], 'Deposit', amount))
-    
-    conn.commit()
-    conn.close()
+    try:
+        write_pipeline.deposit(session['account_number'], amount).result()
+    except PostingError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('dashboard'))
     
-    flash(f'Successfully deposited Rupees {amount:,.2f}', 'success')
+    flash(f'Successfully deposited Rupees {money.format_amount(amount)}', 'success')
     return redirect(url_for('dashboard'))
 
 @app.route('/withdraw', methods=['POST'])
@@ -176,29 +264,21 @@ def withdraw():
     if 'username' not in session:
         return redirect(url_for('login'))
     
-    amount = float(request.form['amount'])
-    
-    conn = get_db_connection()
-    account = conn.execute('SELECT balance FROM accounts WHERE account_number = ?',
-                         (session['account_number'],)).fetchone()
+    try:
+        amount = money.parse_amount(request.form['amount'])
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('dashboard'))
     
     if amount <= 0:
         flash('Withdrawal amount must be positive', 'danger')
-    elif amount > account['balance']:
-        flash('Insufficient funds', 'danger')
     else:
-        # Update balance
-        conn.execute('UPDATE accounts SET balance = balance - ? WHERE account_number = ?',
-                   (amount, session['account_number']))
-        
-        # Record transaction
-        conn.execute('INSERT INTO transactions (account_number, type, amount) VALUES (?, ?, ?)',
-                   (session['account_number'], 'Withdrawal', amount))
-        
-        conn.commit()
-        flash(f'Successfully withdrew Rupees {amount:,.2f}', 'success')
+        try:
+            write_pipeline.withdraw(session['account_number'], amount).result()
+            flash(f'Successfully withdrew Rupees {money.format_amount(amount)}', 'success')
+        except PostingError as e:
+            flash(str(e), 'danger')
     
-    conn.close()
     return redirect(url_for('dashboard'))
 
 @app.route('/transfer', methods=['POST'])
@@ -207,57 +287,27 @@ def transfer():
         return redirect(url_for('login'))
     
     to_account = request.form['to_account']
-    amount = float(request.form['amount'])
-    
-    if to_account == session['account_number']:
-        flash("Cannot transfer to your own account", 'danger')
+    try:
+        amount = money.parse_amount(request.form['amount'])
+    except ValueError as e:
+        flash(str(e), 'danger')
         return redirect(url_for('dashboard'))
-    
-    conn = get_db_connection()
-    
-    # Check recipient exists
-    recipient = conn.execute('SELECT name FROM accounts WHERE account_number = ?',
-                           (to_account,)).fetchone()
-    if not recipient:
-        flash('Recipient account not found', 'danger')
-        conn.close()
+    if amount <= 0:
+        flash('Transfer amount must be positive', 'danger')
         return redirect(url_for('dashboard'))
     
-    # Check sufficient balance
-    sender_balance = conn.execute('SELECT balance FROM accounts WHERE account_number = ?',
-                                (session['account_number'],)).fetchone()['balance']
-    if amount > sender_balance:
-        flash('Insufficient funds', 'danger')
-        conn.close()
+    if to_account == session['account_number']:
+        flash("Cannot transfer to your own account", 'danger')
         return redirect(url_for('dashboard'))
     
-    # Perform transfer
+    # Recipient lookup, balance check and both postings commit together
     try:
-        # Deduct from sender
-        conn.execute('UPDATE accounts SET balance = balance - ? WHERE account_number = ?',
-                   (amount, session['account_number']))
-        
-        # Add to recipient
-        conn.execute('UPDATE accounts SET balance = balance + ? WHERE account_number = ?',
-                   (amount, to_account))
-        
-        # Record transactions
-        conn.execute('''INSERT INTO transactions 
-                      (account_number, type, amount, related_account) 
-                      VALUES (?, ?, ?, ?)''',
-                   (session['account_number'], 'Transfer Sent', amount, to_account))
-        conn.execute('''INSERT INTO transactions 
-                      (account_number, type, amount, related_account) 
-                      VALUES (?, ?, ?, ?)''',
-                   (to_account, 'Transfer Received', amount, session['account_number']))
-        
-        conn.commit()
-        flash(f'Successfully transferred Rupees {amount:,.2f} to account {to_account}', 'success')
-    except:
-        conn.rollback()
+        write_pipeline.transfer(session['account_number'], to_account, amount).result()
+        flash(f'Successfully transferred Rupees {money.format_amount(amount)} to account {to_account}', 'success')
+    except PostingError as e:
+        flash(str(e), 'danger')
+    except Exception:
         flash('Transfer failed. Please try again.', 'danger')
-    finally:
-        conn.close()
     
     return redirect(url_for('dashboard'))
 
@@ -267,229 +317,8 @@ def logout():
     flash('You have been logged out', 'info')
     return redirect(url_for('home'))
 
-# Create templates directory and HTML files
-os.makedirs('templates', exist_ok=True)
-
-# Base template
-with open('templates/base.html', 'w', encoding='utf-8') as f:
-    f.write('''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Simple Bank - {% block title %}{% endblock %}</title>
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
-    <style>
-        .currency-input { position: relative; }
-        .currency-input input { padding-left: 30px; }
-    </style>
-</head>
-<body>
-    <nav class="navbar navbar-expand-lg navbar-dark bg-primary">
-        <div class="container">
-            <a class="navbar-brand" href="/">Online Banking System</a>
-            <div class="navbar-nav">
-                {% if 'username' in session %}
-                    <span class="nav-item text-white me-3">Welcome, {{ session['username'] }}</span>
-                    <a class="nav-item nav-link" href="{{ url_for('logout') }}">Logout</a>
-                {% else %}
-                    <a class="nav-item nav-link" href="{{ url_for('login') }}">Login</a>
-                    <a class="nav-item nav-link" href="{{ url_for('register') }}">Register</a>
-                {% endif %}
-            </div>
-        </div>
-    </nav>
-
-    <div class="container mt-4">
-        {% with messages = get_flashed_messages(with_categories=true) %}
-            {% if messages %}
-                {% for category, message in messages %}
-                    <div class="alert alert-{{ category }} alert-dismissible fade show">
-                        {{ message }}
-                        <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
-                    </div>
-                {% endfor %}
-            {% endif %}
-        {% endwith %}
-        
-        {% block content %}{% endblock %}
-    </div>
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
-</body>
-</html>''')
-
-# Login template
-with open('templates/login.html', 'w', encoding='utf-8') as f:
-    f.write('''{% extends "base.html" %}
-
-{% block title %}Login{% endblock %}
-
-{% block content %}
-<div class="row justify-content-center">
-    <div class="col-md-6">
-        <div class="card">
-            <div class="card-header bg-primary text-white">
-                <h4 class="mb-0">Login</h4>
-            </div>
-            <div class="card-body">
-                <form method="POST" action="{{ url_for('login') }}">
-                    <div class="mb-3">
-                        <label for="username" class="form-label">Username</label>
-                        <input type="text" class="form-control" id="username" name="username" required>
-                    </div>
-                    <div class="mb-3">
-                        <label for="password" class="form-label">Password</label>
-                        <input type="password" class="form-control" id="password" name="password" required>
-                    </div>
-                    <button type="submit" class="btn btn-primary w-100">Login</button>
-                </form>
-                <hr>
-                <p class="text-center">Don't have an account? <a href="{{ url_for('register') }}">Register here</a></p>
-            </div>
-        </div>
-    </div>
-</div>
-{% endblock %}''')
-
-# Register template
-with open('templates/register.html', 'w', encoding='utf-8') as f:
-    f.write('''{% extends "base.html" %}
-
-{% block title %}Register{% endblock %}
-
-{% block content %}
-<div class="row justify-content-center">
-    <div class="col-md-6">
-        <div class="card">
-            <div class="card-header bg-primary text-white">
-                <h4 class="mb-0">Register</h4>
-            </div>
-            <div class="card-body">
-                <form method="POST" action="{{ url_for('register') }}">
-                    <div class="mb-3">
-                        <label for="username" class="form-label">Username</label>
-                        <input type="text" class="form-control" id="username" name="username" required>
-                    </div>
-                    <div class="mb-3">
-                        <label for="password" class="form-label">Password</label>
-                        <input type="password" class="form-control" id="password" name="password" required>
-                    </div>
-                    <div class="mb-3">
-                        <label for="name" class="form-label">Full Name</label>
-                        <input type="text" class="form-control" id="name" name="name" required>
-                    </div>
-                    <div class="mb-3">
-                        <label for="initial_deposit" class="form-label">Initial Deposit (Rupees)</label>
-                        <input type="number" class="form-control" id="initial_deposit" name="initial_deposit" value="0" min="0" step="0.01" required>
-                    </div>
-                    <button type="submit" class="btn btn-primary w-100">Register</button>
-                </form>
-                <hr>
-                <p class="text-center">Already have an account? <a href="{{ url_for('login') }}">Login here</a></p>
-            </div>
-        </div>
-    </div>
-</div>
-{% endblock %}''')
-
-# Dashboard template
-with open('templates/dashboard.html', 'w', encoding='utf-8') as f:
-    f.write('''{% extends "base.html" %}
-
-{% block title %}Dashboard{% endblock %}
-
-{% block content %}
-<div class="row">
-    <div class="col-md-8">
-        <div class="card mb-4">
-            <div class="card-header bg-primary text-white">
-                <h4 class="mb-0">Account Summary</h4>
-            </div>
-            <div class="card-body">
-                <h5>Welcome, {{ account['name'] }}!</h5>
-                <p>Account Number: {{ account['account_number'] }}</p>
-                <p class="fs-3">Balance: Rupees {{ account['balance'] | indian_format }}</p>
-            </div>
-        </div>
-
-        <div class="card mb-4">
-            <div class="card-header bg-primary text-white">
-                <h4 class="mb-0">Recent Transactions</h4>
-            </div>
-            <div class="card-body">
-                {% if transactions %}
-                    <div class="table-responsive">
-                        <table class="table table-striped">
-                            <thead>
-                                <tr>
-                                    <th>Date</th>
-                                    <th>Type</th>
-                                    <th>Amount (Rupees)</th>
-                                    <th>Related Account</th>
-                                </tr>
-                            </thead>
-                            <tbody>
-                                {% for t in transactions %}
-                                    <tr>
-                                        <td>{{ t['timestamp'] }}</td>
-                                        <td>{{ t['type'] }}</td>
-                                        <td>{{ t['amount'] | indian_format }}</td>
-                                        <td>{{ t['related_account'] or '-' }}</td>
-                                    </tr>
-                                {% endfor %}
-                            </tbody>
-                        </table>
-                    </div>
-                {% else %}
-                    <p class="text-center">No transactions yet.</p>
-                {% endif %}
-            </div>
-        </div>
-    </div>
-
-    <div class="col-md-4">
-        <div class="card mb-4">
-            <div class="card-header bg-primary text-white">
-                <h4 class="mb-0">Quick Actions</h4>
-            </div>
-            <div class="card-body">
-                <form method="POST" action="{{ url_for('deposit') }}">
-                    <div class="mb-3">
-                        <label class="form-label">Deposit Money (Rupees)</label>
-                        <div class="input-group">
-                            <input type="number" class="form-control" name="amount" min="0.01" step="0.01" placeholder="Amount" required>
-                            <button type="submit" class="btn btn-success">Deposit</button>
-                        </div>
-                    </div>
-                </form>
-
-                <form method="POST" action="{{ url_for('withdraw') }}">
-                    <div class="mb-3">
-                        <label class="form-label">Withdraw Money (Rupees)</label>
-                        <div class="input-group">
-                            <input type="number" class="form-control" name="amount" min="0.01" step="0.01" placeholder="Amount" required>
-                            <button type="submit" class="btn btn-warning">Withdraw</button>
-                        </div>
-                    </div>
-                </form>
-
-                <form method="POST" action="{{ url_for('transfer') }}">
-                    <div class="mb-3">
-                        <label class="form-label">Transfer Money (Rupees)</label>
-                        <input type="text" class="form-control mb-2" name="to_account" placeholder="Recipient Account #" required>
-                        <div class="input-group">
-                            <input type="number" class="form-control" name="amount" min="0.01" step="0.01" placeholder="Amount" required>
-                            <button type="submit" class="btn btn-primary">Transfer</button>
-                        </div>
-                    </div>
-                </form>
-
-                <a href="{{ url_for('logout') }}" class="btn btn-danger w-100 mt-3">Logout</a>
-            </div>
-        </div>
-    </div>
-</div>
-{% endblock %}''')
+# Compile every template now instead of on each worker's first request
+precompile_templates(app)
 
 if __name__ == '__main__':
     initialize_database()
@@ -0,0 +1,206 @@
+import argparse
+import re
+from datetime import date, datetime, timezone
+
+import incremental_backup
+import money
+import storage
+from postings import CREDIT_TYPES
+
+# Historical balances. Every transaction row carries running_balance, the
+# account's balance right after it was posted, so the balance at any time
+# is one index seek on (account_number, timestamp, id). Rows written before
+# running balances existed are NULL until backfill() fills them in; for
+# those, balance_as_of() starts from the latest balance_checkpoints row and
+# replays the few transactions after it.
+
+# Signed amount of a transactions row
+SIGNED_AMOUNT = ("CASE WHEN type IN (" + ", ".join(f"'{t}'" for t in CREDIT_TYPES) + ") "
+                 "THEN amount ELSE -amount END")
+
+# 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM[:SS]', in UTC like the stored
+# timestamps. Other ISO 8601 forms (20240331, week dates, 'T', offsets) are
+# refused rather than compared as strings or silently misread.
+_WHEN = re.compile(r"\d{4}-\d{2}-\d{2}(?: \d{2}:\d{2}(?::\d{2})?)?")
+
+
+def add_running_balance(conn):
+    """Add transactions.running_balance and the balance_checkpoints table"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(transactions)")]
+    if 'running_balance' not in columns:
+        conn.execute("ALTER TABLE transactions ADD COLUMN running_balance INTEGER")
+    conn.execute('''CREATE TABLE IF NOT EXISTS balance_checkpoints (
+                    account_number TEXT NOT NULL,
+                    as_of DATETIME NOT NULL,
+                    transaction_id INTEGER NOT NULL,
+                    balance INTEGER NOT NULL,
+                    PRIMARY KEY (account_number, as_of, transaction_id)) WITHOUT ROWID''')
+    # The change log triggers list columns explicitly
+    incremental_backup.install_change_log(conn)
+
+
+def record_opening_deposits(conn):
+    """Post the unrecorded opening balance of every account as a Deposit.
+
+    Accounts used to be created with their initial deposit in the balance
+    and no transaction row. The opening is whatever the balance has beyond
+    the signed sum of its transactions; it is dated a second before the
+    account's first transaction. A negative remainder can't be an opening
+    deposit and is left for reconciliation to report.
+    """
+    return conn.execute(f'''INSERT INTO transactions (account_number, type, amount, timestamp, running_balance)
+                            SELECT account_number, 'Deposit', opening, opened_at, opening FROM (
+                                SELECT a.account_number, a.balance - COALESCE(SUM({SIGNED_AMOUNT}), 0) AS opening,
+                                       COALESCE(datetime(MIN(t.timestamp), '-1 second'), CURRENT_TIMESTAMP)
+                                           AS opened_at
+                                FROM accounts AS a
+                                LEFT JOIN transactions AS t ON t.account_number = a.account_number
+                                GROUP BY a.account_number)
+                            WHERE opening > 0''').rowcount
+
+
+def as_of_bound(when):
+    """Inclusive upper timestamp for a datetime, a date (end of day) or a string.
+
+    Timestamps are stored in UTC, so aware datetimes are converted to UTC;
+    naive ones and strings are taken to be UTC already. Raises ValueError
+    for a string in any other format.
+    """
+    if isinstance(when, str):
+        when = when.strip()
+        if not _WHEN.fullmatch(when):
+            raise ValueError("Expected YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+        when = date.fromisoformat(when) if len(when) == 10 else datetime.fromisoformat(when)
+    if isinstance(when, datetime):
+        if when.tzinfo is not None:
+            when = when.astimezone(timezone.utc).replace(tzinfo=None)
+        return when.strftime('%Y-%m-%d %H:%M:%S')
+    return f"{when.isoformat()} 23:59:59"
+
+
+def balance_as_of(conn, account_number, when):
+    """Balance in paise at the end of `when`; None if the account doesn't exist"""
+    bound = as_of_bound(when)
+    last = conn.execute('''SELECT running_balance FROM transactions
+                           WHERE account_number = ? AND timestamp <= ?
+                           ORDER BY timestamp DESC, id DESC LIMIT 1''', (account_number, bound)).fetchone()
+    if last is not None and last[0] is not None:
+        return last[0]
+    if last is None:
+        # Before the first transaction: the balance the next one started from
+        following = conn.execute(f'''SELECT running_balance - ({SIGNED_AMOUNT}) FROM transactions
+                                     WHERE account_number = ? AND timestamp > ?
+                                     ORDER BY timestamp, id LIMIT 1''', (account_number, bound)).fetchone()
+        if following is not None and following[0] is not None:
+            return following[0]
+
+    checkpoint = conn.execute('''SELECT as_of, transaction_id, balance FROM balance_checkpoints
+                                 WHERE account_number = ? AND as_of <= ?
+                                 ORDER BY as_of DESC, transaction_id DESC LIMIT 1''',
+                              (account_number, bound)).fetchone()
+    if checkpoint is not None:
+        as_of, transaction_id, start = checkpoint
+        replayed = conn.execute(f'''SELECT COALESCE(SUM({SIGNED_AMOUNT}), 0) FROM transactions
+                                    WHERE account_number = ? AND (timestamp, id) > (?, ?)
+                                      AND timestamp <= ?''',
+                                (account_number, as_of, transaction_id, bound)).fetchone()[0]
+        return start + replayed
+
+    # No snapshot at all: work back from the current balance
+    current = conn.execute("SELECT balance FROM accounts WHERE account_number = ?", (account_number,)).fetchone()
+    if current is None:
+        return None
+    later = conn.execute(f'''SELECT COALESCE(SUM({SIGNED_AMOUNT}), 0) FROM transactions
+                             WHERE account_number = ? AND timestamp > ?''', (account_number, bound)).fetchone()[0]
+    return current[0] - later
+
+
+def write_checkpoints(conn):
+    """Checkpoint every account's current balance at its latest transaction.
+
+    Meant to run periodically (e.g. nightly), so a replay never covers
+    more than one period. Returns the number of checkpoints added.
+    """
+    return conn.execute('''INSERT OR IGNORE INTO balance_checkpoints (account_number, as_of, transaction_id, balance)
+                           SELECT a.account_number, t.timestamp, t.id, a.balance
+                           FROM accounts AS a
+                           JOIN transactions AS t ON t.id = (
+                               SELECT id FROM transactions WHERE account_number = a.account_number
+                               ORDER BY timestamp DESC, id DESC LIMIT 1)''').rowcount
+
+
+def backfill(conn, accounts_per_batch=500):
+    """Fill NULL running balances, working back from each account's balance.
+
+    Runs one short write transaction per batch of accounts on an
+    autocommit connection, so postings keep flowing between batches.
+    Returns the number of rows updated.
+    """
+    updated = 0
+    last_account = ''
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            accounts = conn.execute('''SELECT DISTINCT account_number FROM transactions
+                                       WHERE running_balance IS NULL AND account_number > ?
+                                       ORDER BY account_number LIMIT ?''',
+                                    (last_account, accounts_per_batch)).fetchall()
+            if not accounts:
+                conn.execute("COMMIT")
+                return updated
+            for (account_number,) in accounts:
+                updated += _backfill_account(conn, account_number)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        last_account = accounts[-1][0]
+
+
+def _backfill_account(conn, account_number):
+    current = conn.execute("SELECT balance FROM accounts WHERE account_number = ?", (account_number,)).fetchone()
+    if current is None:
+        return 0
+    running = current[0]
+    updates = []
+    for row_id, signed, stored in conn.execute(f'''SELECT id, {SIGNED_AMOUNT}, running_balance FROM transactions
+                                                  WHERE account_number = ?
+                                                  ORDER BY timestamp DESC, id DESC''', (account_number,)):
+        if stored is None:
+            updates.append((running, row_id))
+        running -= signed
+    conn.executemany("UPDATE transactions SET running_balance = ? WHERE id = ?", updates)
+    return len(updates)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Running balances and balance checkpoints")
+    parser.add_argument('--database', default='bank.db')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('backfill', help="fill running balances of older transactions")
+    sub.add_parser('checkpoint', help="checkpoint every account's current balance")
+    cmd = sub.add_parser('as-of', help="an account's balance at a point in time")
+    cmd.add_argument('account_number')
+    cmd.add_argument('when', help="'YYYY-MM-DD' (end of day) or 'YYYY-MM-DD HH:MM:SS' in UTC")
+    args = parser.parse_args()
+
+    conn = storage.connect(args.database, isolation_level=None)
+    try:
+        if args.command == 'backfill':
+            print(f"Backfilled {backfill(conn)} running balances.")
+        elif args.command == 'checkpoint':
+            conn.execute("BEGIN IMMEDIATE")
+            added = write_checkpoints(conn)
+            conn.execute("COMMIT")
+            print(f"Added {added} balance checkpoints.")
+        else:
+            try:
+                paise = balance_as_of(conn, args.account_number, args.when)
+            except ValueError as e:
+                raise SystemExit(str(e))
+            if paise is None:
+                print("Account not found.")
+            else:
+                print(f"Balance at {as_of_bound(args.when)}: {money.format_amount(paise)}")
+    finally:
+        conn.close()
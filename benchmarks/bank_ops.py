@@ -0,0 +1,318 @@
+"""Microbenchmarks for the CLI's Bank methods.
+
+Times each Bank operation against a database on disk and one on a RAM
+disk, at several transaction table sizes, both as called and with its
+decorators removed. The decorators (timed, authenticate, rate_limiter,
+error_handler) are also timed on their own around an empty method.
+register, logout and delete_account get a fresh user, session or
+account for every call, made outside the timed section. Every run
+checks the balance and row counts it should have changed, so calls
+that fail (and print to the suppressed stdout) stop the benchmark
+instead of being timed as successes.
+
+    python benchmarks/bank_ops.py --sizes 0,100000 --save baseline.json
+    python benchmarks/bank_ops.py --sizes 0,100000 --compare baseline.json --tolerance 0.15
+
+--compare exits with status 1 if any method body or decorator got
+slower than the baseline by more than the tolerance. Use the same
+machine and Python for both runs.
+"""
+import argparse
+import contextlib
+import importlib.util
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import load  # noqa: E402
+from postings import open_account  # noqa: E402
+from ratelimit import Limit  # noqa: E402
+
+# Method -> arguments. The account is topped up with TOP_UP first, so
+# withdrawals and transfers never run dry.
+METHODS = {
+    'login': None,  # filled in with the seeded user's credentials
+    'get_account_balance': (),
+    'display_account_details': (),
+    'get_transaction_history': (),
+    'deposit': ('1.00',),
+    'withdraw': ('0.50',),
+    'transfer_money': None,  # filled in with another seeded account
+}
+TOP_UP = '1000000.00'
+
+# Change in the logged-in account's (balance in paise, transactions) per
+# call; every other method must leave both alone
+EFFECTS = {
+    'deposit': (100, 1),
+    'withdraw': (-50, 1),
+    'transfer_money': (-25, 1),
+}
+
+# Calls per run for the methods that need fresh state every call
+LIFECYCLE_CALLS = 10
+
+# A RAM disk. The Bank's writer thread, token store and number allocator
+# each open their own connection, so a private :memory: database can't
+# be shared between them; a file on tmpfs has no disk I/O instead.
+MEMORY_DIRS = ('/dev/shm',)
+
+
+def load_cli():
+    """Import online-banking-system.py, whose name isn't a valid module name"""
+    spec = importlib.util.spec_from_file_location('bank_cli', os.path.join(ROOT, 'online-banking-system.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # Keep the limiter's bookkeeping in the measurement without ever refusing
+    module.limiter.default = Limit(10 ** 9, 1)
+    module.limiter.limits = {}
+    return module
+
+
+def decorators(method):
+    """Names of the decorators on a Bank method, outermost first"""
+    names = []
+    func = method.__func__
+    while hasattr(func, '__wrapped__'):
+        code = func.__code__
+        # 'authenticate.<locals>.wrapper' -> 'authenticate'
+        names.append(getattr(code, 'co_qualname', code.co_name).split('.')[0])
+        func = func.__wrapped__
+    return names, func
+
+
+def measure(func, repeat):
+    """Best seconds per call over `repeat` runs, and the number of calls made"""
+    timer = timeit.Timer(func)
+    trials = []
+    number, _ = timer.autorange(lambda n, seconds: trials.append(n))
+    return min(timer.repeat(repeat, number)) / number, sum(trials) + repeat * number
+
+
+def measure_each(prepare, func, repeat, number):
+    """Best seconds per call over `repeat` runs of `number` calls.
+
+    Each call gets the arguments returned by prepare(), which runs
+    outside the timed section.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        elapsed = 0.0
+        for _ in range(number):
+            args = prepare()
+            started = time.perf_counter()
+            func(*args)
+            elapsed += time.perf_counter() - started
+        best = min(best, elapsed / number)
+    return best
+
+
+def check(name, expected, actual):
+    if actual != expected:
+        raise SystemExit(f"{name}: expected {expected}, got {actual}; the calls being timed are failing")
+
+
+def account_state(bank):
+    """(balance, transactions) of the logged-in account, from the database"""
+    account_number = bank.current_user['account_number']
+    balance = bank.conn.execute("SELECT balance FROM accounts WHERE account_number = ?",
+                                (account_number,)).fetchone()[0]
+    count = bank.conn.execute("SELECT COUNT(*) FROM transactions WHERE account_number = ?",
+                              (account_number,)).fetchone()[0]
+    return balance, count
+
+
+def bench_method(bank, name, args, repeat):
+    names, body = decorators(getattr(bank, name))
+    before = account_state(bank)
+    total, total_calls = measure(lambda: getattr(bank, name)(*args), repeat)
+    bare, bare_calls = measure(lambda: body(bank, *args), repeat)
+    calls = total_calls + bare_calls
+    balance_change, count_change = EFFECTS.get(name, (0, 0))
+    check(name, (before[0] + calls * balance_change, before[1] + calls * count_change), account_state(bank))
+    return {'total_us': round(total * 1e6, 2), 'body_us': round(bare * 1e6, 2), 'decorators': names}
+
+
+def bench_each(bank, name, prepare, repeat, number):
+    names, body = decorators(getattr(bank, name))
+    total = measure_each(prepare, getattr(bank, name), repeat, number)
+    bare = measure_each(prepare, lambda *args: body(bank, *args), repeat, number)
+    return {'total_us': round(total * 1e6, 2), 'body_us': round(bare * 1e6, 2), 'decorators': names}
+
+
+def bench_lifecycle(cli, bank, repeat, number=LIFECYCLE_CALLS):
+    """register, logout and delete_account, each on fresh state per call"""
+    calls = 2 * repeat * number
+    usernames = (f"bank-ops-{n}" for n in itertools.count())
+    user = dict(bank.current_user)
+    password_hash = bank._hash_password(load.PASSWORD)
+    made = []
+
+    def count(sql, *args):
+        return bank.conn.execute(sql, args).fetchone()[0]
+
+    def new_user():
+        made.append(next(usernames))
+        return made[-1], load.PASSWORD, 'Bench User', '0'
+
+    def signed_in():
+        bank.current_user = dict(user)
+        bank.token = bank._generate_token(user['username'], user['account_number'])
+        return ()
+
+    def new_account():
+        # What register and login leave behind, without hashing a password
+        account_number = bank.account_numbers.allocate()
+        username = next(usernames)
+        open_account(bank.conn, account_number, 'Bench User', 0)
+        bank.conn.execute("INSERT INTO users VALUES (?, ?, ?)", (username, account_number, password_hash))
+        bank.conn.commit()
+        made.append(account_number)
+        bank.current_user = {'username': username, 'account_number': account_number,
+                             'name': 'Bench User', 'balance': 0}
+        bank.token = bank._generate_token(username, account_number)
+        return ()
+
+    results = {}
+    results['register'] = bench_each(bank, 'register', new_user, repeat, number)
+    check('register', calls, count("SELECT COUNT(*) FROM users WHERE username IN (SELECT value FROM json_each(?))",
+                                   json.dumps(made)))
+
+    revoked = count("SELECT COUNT(*) FROM revoked_tokens")
+    results['logout'] = bench_each(bank, 'logout', signed_in, repeat, number)
+    check('logout', revoked + calls, count("SELECT COUNT(*) FROM revoked_tokens"))
+
+    made.clear()
+    cli.input = lambda prompt='': 'yes'  # answers the confirmation prompt
+    try:
+        results['delete_account'] = bench_each(bank, 'delete_account', new_account, repeat, number)
+    finally:
+        del cli.input
+    check('delete_account', (calls, 0),
+          (len(made), count("SELECT COUNT(*) FROM accounts WHERE account_number IN (SELECT value FROM json_each(?))",
+                            json.dumps(made))))
+    return results
+
+
+def bench_decorators(cli, bank, repeat):
+    """Each decorator's own cost, measured around an empty method.
+
+    Subtracting a method's body from its total would bury a few
+    microseconds of decorator under the body's noise, so every decorator
+    wraps a no-op instead and runs against the logged-in bank.
+    """
+    def noop(self):
+        return None
+
+    baseline, _ = measure(lambda: noop(bank), repeat)
+    result = {}
+    for name in ('timed', 'authenticate', 'rate_limiter', 'error_handler'):
+        wrapped = getattr(cli, name)(noop)
+        seconds, _ = measure(lambda: wrapped(bank), repeat)
+        result[name] = round((seconds - baseline) * 1e6, 3)
+    return result
+
+
+def bench_database(cli, directory, transactions, accounts, repeat):
+    load.seed(directory, accounts, transactions)
+    users = load.load_users(directory)
+    args = dict(METHODS)
+    args['login'] = (users[0][0], load.PASSWORD)
+    args['transfer_money'] = (users[1][1], '0.25')
+
+    previous = os.getcwd()
+    os.chdir(directory)  # the Bank opens bank.db in the working directory
+    bank = cli.Bank()
+    try:
+        bank.login(*args['login'])
+        before = account_state(bank)[0]
+        bank.deposit(TOP_UP)
+        check('deposit', before + cli.money.parse_amount(TOP_UP), account_state(bank)[0])
+        decorators_us = bench_decorators(cli, bank, repeat)
+        methods = {name: bench_method(bank, name, method_args, repeat) for name, method_args in args.items()}
+        methods.update(bench_lifecycle(cli, bank, repeat))
+        return {'decorators_us': decorators_us, 'methods': methods}
+    finally:
+        bank.close_connection()
+        os.chdir(previous)
+
+
+def run(sizes, storages, accounts, repeat):
+    cli = load_cli()
+    results = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for storage_name in storages:
+            parent = None
+            if storage_name == 'memory':
+                parent = next((d for d in MEMORY_DIRS if os.path.isdir(d)), None)
+                if parent is None:
+                    print(f"No RAM disk found in {MEMORY_DIRS}; skipping memory", file=sys.stderr)
+                    continue
+            for size in sizes:
+                directory = tempfile.mkdtemp(prefix='bank-ops-', dir=parent)
+                try:
+                    results[f"{storage_name}/{size}"] = bench_database(cli, directory, size, accounts, repeat)
+                finally:
+                    shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing every timing more than `tolerance` slower than the baseline"""
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        pairs = [(f"{name} body", timing['body_us'], before['methods'].get(name, {}).get('body_us'))
+                 for name, timing in result['methods'].items()]
+        pairs += [(f"@{name}", us, before['decorators_us'].get(name))
+                  for name, us in result['decorators_us'].items()]
+        for label, now_us, before_us in pairs:
+            # Sub-microsecond differences are mostly timer noise
+            if before_us is None or now_us - before_us < 1:
+                continue
+            if now_us > before_us * (1 + tolerance):
+                regressions.append(f"{key} {label}: {before_us}us -> {now_us}us")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark the Bank methods and their decorators")
+    parser.add_argument('--sizes', default='0,10000,100000', help="transaction table sizes")
+    parser.add_argument('--storage', default='disk,memory', help="disk, memory (RAM disk) or both")
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help="write the results as a baseline JSON file")
+    parser.add_argument('--compare', help="baseline JSON file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown (default 0.25)")
+    args = parser.parse_args()
+
+    results = run([int(s) for s in args.sizes.split(',')], args.storage.split(','), args.accounts, args.repeat)
+    for key, result in results.items():
+        print(f"\n{key} transactions")
+        print("  decorators: " + ', '.join(f"@{name} {us:.2f}us" for name, us in result['decorators_us'].items()))
+        for name, timing in result['methods'].items():
+            print(f"  {name:<24} {timing['total_us']:>10.1f}us  body {timing['body_us']:>10.1f}us  "
+                  f"@{' @'.join(timing['decorators'])}")
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'commit': load._commit(), 'python': sys.version.split()[0], 'results': results}, f, indent=2)
+        print(f"\nBaseline written to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\n{len(regressions)} regressions beyond {args.tolerance:.0%}")
+        for line in regressions:
+            print(f"  {line}")
+        raise SystemExit(1 if regressions else 0)
@@ -0,0 +1,84 @@
+"""Microbenchmark for the indian_format template filter.
+
+Compares the original float/string-reversal filter with
+formatting.format_indian (cached) and format_indian_batch over a column
+of amounts shaped like a statement page: mostly distinct values with
+some repeats.
+
+    python benchmarks/indian_format.py --rows 5000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formatting import format_indian, format_indian_batch  # noqa: E402
+
+
+def legacy_indian_format(value):
+    """The filter as it shipped before formatting.py (takes rupees)"""
+    value = float(value)
+    if value < 1000:
+        return "{:,.2f}".format(value)
+    else:
+        value = str(value).split('.')[0]
+        last_three = value[-3:]
+        other_numbers = value[:-3]
+        if other_numbers:
+            formatted = other_numbers[::-1].replace('', ',')[1:-1][::-1] + ',' + last_three
+        else:
+            formatted = last_three
+        return formatted
+
+
+def make_column(rows, seed=42):
+    rng = random.Random(seed)
+    common = [rng.choice((50000, 100000, 250000, 500000, 1000000)) for _ in range(rows // 4)]
+    distinct = [rng.randint(100, 10 ** 10) for _ in range(rows - len(common))]
+    column = common + distinct
+    rng.shuffle(column)
+    return column
+
+
+def run(rows, repeat):
+    column = make_column(rows)
+    rupees = [paise / 100 for paise in column]
+
+    def legacy():
+        for value in rupees:
+            legacy_indian_format(value)
+
+    def cold():
+        format_indian.cache_clear()
+        for value in column:
+            format_indian(value)
+
+    def warm():
+        for value in column:
+            format_indian(value)
+
+    def batch():
+        format_indian_batch(column)
+
+    results = {}
+    for name, fn in (('legacy', legacy), ('format_indian_cold', cold),
+                     ('format_indian_warm', warm), ('format_indian_batch', batch)):
+        fn()
+        best = min(timeit.repeat(fn, number=1, repeat=repeat))
+        results[name] = {'ns_per_value': round(best / rows * 1e9, 1)}
+    base = results['legacy']['ns_per_value']
+    for result in results.values():
+        result['speedup'] = round(base / result['ns_per_value'], 2)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps({'rows': args.rows, 'results': run(args.rows, args.repeat)}, indent=2))
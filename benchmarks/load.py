@@ -0,0 +1,355 @@
+"""Load generator and throughput benchmark for the web app.
+
+`seed` builds a bank.db with N accounts (each with a login) and M
+transactions. `run` drives the app with a weighted mix of operations
+from --concurrency threads, each logged in as a different user, and
+prints p50/p95/p99 latency, ops/sec and error rates per operation as
+JSON. By default requests go through Flask's test client in this
+process; --url sends them to a server started in the same directory.
+
+    python benchmarks/load.py seed --dir /tmp/bank-load --accounts 10000 --transactions 500000
+    python benchmarks/load.py run --dir /tmp/bank-load --concurrency 8 --duration 30 \\
+        --mix login=1,dashboard=6,history=2,deposit=2,withdraw=2,transfer=2 --output results.json
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import account_numbers  # noqa: E402
+import incremental_backup  # noqa: E402
+import migrations  # noqa: E402
+import storage  # noqa: E402
+from passwords import hash_password  # noqa: E402
+
+PASSWORD = 'load-test-password'
+DEFAULT_MIX = 'login=1,dashboard=6,history=2,deposit=2,withdraw=2,transfer=2'
+BATCH = 10000
+
+
+def seed(directory, accounts, transactions, seed_value=42):
+    """Create directory/bank.db with `accounts` users and `transactions` rows"""
+    os.makedirs(directory, exist_ok=True)
+    database = os.path.join(directory, 'bank.db')
+    migrations.initialize(database)
+    rng = random.Random(seed_value)
+    # Every user shares one password, so seeding costs a single KDF run
+    password_hash = hash_password(PASSWORD)
+
+    conn = storage.connect(database, profile='throughput', isolation_level=None)
+    try:
+        # Seed rows aren't changes worth shipping to backups
+        for table in incremental_backup.TRACKED_TABLES:
+            incremental_backup.drop_change_log_triggers(conn, table)
+        conn.execute("BEGIN IMMEDIATE")
+        start = conn.execute("SELECT next_value FROM account_sequence WHERE name = ?",
+                             (account_numbers.SEQUENCE_NAME,)).fetchone()[0]
+        numbers = [str(v) + account_numbers.luhn_check_digit(str(v)) for v in range(start, start + accounts)]
+        conn.execute("UPDATE account_sequence SET next_value = ? WHERE name = ?",
+                     (start + accounts, account_numbers.SEQUENCE_NAME))
+        conn.executemany("INSERT INTO accounts (account_number, name, balance) VALUES (?, ?, 0)",
+                         ((number, f"Load User {i}") for i, number in enumerate(numbers)))
+        conn.executemany("INSERT INTO users (username, account_number, password_hash) VALUES (?, ?, ?)",
+                         ((f"load{i}", number, password_hash) for i, number in enumerate(numbers)))
+
+        # Deposits and withdrawals spread over the last year, in time order,
+        # with running balances that never go negative. Timestamps are UTC,
+        # like the CURRENT_TIMESTAMP of rows the app writes.
+        balances = [0] * accounts
+        moment = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=365)
+        step = timedelta(days=365) / max(transactions, 1)
+        rows = []
+        for _ in range(transactions):
+            code = rng.randrange(accounts)
+            amount = rng.randint(100, 5000000)
+            if rng.random() < 0.4 and balances[code] >= amount:
+                balances[code] -= amount
+                kind = 'Withdrawal'
+            else:
+                balances[code] += amount
+                kind = 'Deposit'
+            moment += step
+            rows.append((numbers[code], kind, amount, moment.strftime('%Y-%m-%d %H:%M:%S'), balances[code]))
+            if len(rows) == BATCH:
+                _insert_transactions(conn, rows)
+                rows = []
+        _insert_transactions(conn, rows)
+        conn.executemany("UPDATE accounts SET balance = ? WHERE account_number = ?", zip(balances, numbers))
+        conn.execute("COMMIT")
+        incremental_backup.install_change_log(conn)
+    finally:
+        conn.close()
+    return database
+
+
+def _insert_transactions(conn, rows):
+    conn.executemany('''INSERT INTO transactions (account_number, type, amount, timestamp, running_balance)
+                        VALUES (?, ?, ?, ?, ?)''', rows)
+
+
+def load_users(directory):
+    conn = storage.connect(os.path.join(directory, 'bank.db'))
+    try:
+        return conn.execute("SELECT username, account_number FROM users WHERE username GLOB 'load*'").fetchall()
+    finally:
+        conn.close()
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"Unknown operation '{name}'. Choose from: {', '.join(OPERATIONS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class TestClient:
+    """One user's session against the app in this process"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data):
+        return self.client.post(path, data=data).status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPClient:
+    """One user's session against a running server; redirects aren't followed"""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.url + path))
+
+    def post(self, path, data):
+        return self._open(urllib.request.Request(self.url + path, urllib.parse.urlencode(data).encode()))
+
+
+def _login(client, user, users, rng):
+    return client.post('/login', {'username': user[0], 'password': PASSWORD})
+
+
+def _dashboard(client, user, users, rng):
+    return client.get('/dashboard')
+
+
+def _history(client, user, users, rng):
+    return client.get('/history')
+
+
+def _deposit(client, user, users, rng):
+    return client.post('/deposit', {'amount': f"{rng.randint(1, 5000)}.00"})
+
+
+def _withdraw(client, user, users, rng):
+    return client.post('/withdraw', {'amount': f"{rng.randint(1, 500)}.00"})
+
+
+def _transfer(client, user, users, rng):
+    to_account = rng.choice(users)[1]
+    while to_account == user[1] and len(users) > 1:
+        to_account = rng.choice(users)[1]
+    return client.post('/transfer', {'to_account': to_account, 'amount': f"{rng.randint(1, 500)}.00"})
+
+
+# Operation -> (request, status it returns on success). A failed login
+# renders the form (200) and a lost session redirects (302), so any other
+# status counts as an error.
+OPERATIONS = {
+    'login': (_login, 302),
+    'dashboard': (_dashboard, 200),
+    'history': (_history, 200),
+    'deposit': (_deposit, 302),
+    'withdraw': (_withdraw, 302),
+    'transfer': (_transfer, 302),
+}
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def summarize(samples, seconds):
+    ordered = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        'ops': len(samples),
+        'ops_per_sec': round(len(samples) / seconds, 1),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3) if ordered else None,
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3) if ordered else None,
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3) if ordered else None,
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else None,
+    }
+
+
+def drive(make_client, users, mix, concurrency, duration, requests, seed_value=42):
+    """Run the mix from `concurrency` threads; returns per-operation samples and wall time"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = {name: [] for name in names}
+    lock = threading.Lock()
+    remaining = [requests]
+    deadline = [None]
+    started = [None]
+
+    def start_clock():
+        # Runs once every session has logged in, before any thread is released
+        started[0] = time.perf_counter()
+        deadline[0] = started[0] + (duration if duration else float('inf'))
+
+    ready = threading.Barrier(concurrency + 1, action=start_clock)
+
+    def worker(index):
+        rng = random.Random(seed_value + index)
+        user = users[index % len(users)]
+        client = make_client()
+        # Not measured: every session starts logged in
+        client.post('/login', {'username': user[0], 'password': PASSWORD})
+        mine = {name: [] for name in names}
+        ready.wait()
+        while time.perf_counter() < deadline[0]:
+            if requests:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                request, expected = OPERATIONS[name]
+                ok = request(client, user, users, rng) == expected
+            except Exception:
+                ok = False
+            mine[name].append((time.perf_counter() - started, ok))
+        with lock:
+            for name in names:
+                samples[name].extend(mine[name])
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started[0]
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    directory = args.dir or tempfile.mkdtemp(prefix='bank-load-')
+    if not os.path.exists(os.path.join(directory, 'bank.db')):
+        if args.url:
+            raise SystemExit(f"No bank.db in {directory}; seed it and start the server there first")
+        seed(directory, args.accounts, args.transactions, args.seed)
+    users = load_users(directory)
+    if not users:
+        raise SystemExit(f"{directory}/bank.db has no load-test users; run the seed command")
+    mix = parse_mix(args.mix)
+
+    if args.url:
+        make_client = lambda: HTTPClient(args.url)  # noqa: E731
+    else:
+        # The app opens bank.db, ratelimit.db and its logs in the working directory
+        os.chdir(directory)
+        os.environ.setdefault('BANK_RATE_LIMIT_BACKEND', 'memory')
+        import app as bank_app
+        if not args.rate_limits:
+            bank_app.limiter.limits.clear()
+        make_client = lambda: TestClient(bank_app.app)  # noqa: E731
+
+    duration = args.duration if args.duration is not None else (0 if args.requests else 10.0)
+    samples, seconds = drive(make_client, users, mix, args.concurrency, duration, args.requests, args.seed)
+    everything = [sample for name in samples for sample in samples[name]]
+    return {
+        'commit': _commit(),
+        'target': args.url or 'test_client',
+        'database': os.path.join(directory, 'bank.db'),
+        'concurrency': args.concurrency,
+        'mix': mix,
+        'seconds': round(seconds, 3),
+        'total': summarize(everything, seconds),
+        'operations': {name: summarize(samples[name], seconds) for name in samples},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    seeding = argparse.ArgumentParser(add_help=False)
+    seeding.add_argument('--dir', help="directory for bank.db (run: a new temporary one)")
+    seeding.add_argument('--accounts', type=int, default=1000)
+    seeding.add_argument('--transactions', type=int, default=50000)
+    seeding.add_argument('--seed', type=int, default=42)
+
+    sub.add_parser('seed', parents=[seeding], help="create a bank.db with load-test users")
+    cmd = sub.add_parser('run', parents=[seeding], help="drive the app and report latency")
+    cmd.add_argument('--url', help="a server started in --dir (default: Flask test client)")
+    cmd.add_argument('--mix', default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    cmd.add_argument('--concurrency', type=int, default=4)
+    cmd.add_argument('--duration', type=float, help="seconds to run (default 10 unless --requests is given)")
+    cmd.add_argument('--requests', type=int, default=0, help="stop after this many operations")
+    cmd.add_argument('--rate-limits', action='store_true', help="keep the app's rate limits on")
+    cmd.add_argument('--output', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.command == 'seed':
+        if not args.dir:
+            parser.error("seed needs --dir")
+        started = time.perf_counter()
+        database = seed(args.dir, args.accounts, args.transactions, args.seed)
+        print(f"Seeded {database} with {args.accounts} accounts and {args.transactions} transactions "
+              f"in {time.perf_counter() - started:.1f}s")
+    else:
+        results = run(args)
+        text = json.dumps(results, indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text + '\n')
+        print(text)
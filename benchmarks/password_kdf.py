@@ -0,0 +1,65 @@
+"""Login throughput at each password KDF cost setting.
+
+For every cost in passwords.COSTS, measures verifications per second on
+one core (inline) and through a PasswordService process pool, and
+reports the pool's logins/sec per core.
+
+    python benchmarks/password_kdf.py --logins 200 --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import COSTS, PasswordService, hash_password, verify_password  # noqa: E402
+
+
+def inline_rate(stored, logins):
+    started = time.perf_counter()
+    for _ in range(logins):
+        verify_password(stored, 'correct horse battery staple')
+    return logins / (time.perf_counter() - started)
+
+
+def pool_rate(cost, stored, logins, workers):
+    service = PasswordService(workers=workers, cost=cost)
+    try:
+        service.verify(stored, 'warm up the pool')
+        # Enough request threads to keep every worker busy
+        with ThreadPoolExecutor(max_workers=workers * 2) as threads:
+            started = time.perf_counter()
+            list(threads.map(lambda _: service.verify(stored, 'correct horse battery staple'), range(logins)))
+            elapsed = time.perf_counter() - started
+        stats = service.stats()
+    finally:
+        service.shutdown()
+    return logins / elapsed, stats
+
+
+def run(logins, workers):
+    results = {}
+    for cost, params in COSTS.items():
+        stored = hash_password('correct horse battery staple', cost)
+        single = inline_rate(stored, max(1, logins // workers))
+        pooled, stats = pool_rate(cost, stored, logins, workers)
+        results[cost] = {
+            'params': params,
+            'inline_logins_per_sec': round(single, 1),
+            'pool_logins_per_sec': round(pooled, 1),
+            'pool_logins_per_sec_per_core': round(pooled / workers, 1),
+            'avg_kdf_ms': round(stats['kdf_seconds_total'] / stats['verifications'] * 1000, 2),
+            'avg_queue_ms': round(stats['queue_wait_seconds_total'] / stats['verifications'] * 1000, 2),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    print(json.dumps({'workers': args.workers, 'results': run(args.logins, args.workers)}, indent=2))
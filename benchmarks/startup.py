@@ -0,0 +1,79 @@
+"""Cold-start benchmark for a web worker.
+
+Each run starts a fresh interpreter that imports app.py and renders the
+login page, which is what a newly booted worker does before serving its
+first request. Runs are repeated with an empty and a warm template
+bytecode cache.
+
+    python benchmarks/startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = '''
+import time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+with app.app.test_request_context('/'):
+    app.render_template('login.html')
+rendered = time.perf_counter()
+print(imported - started, rendered - started)
+'''
+
+
+def boot_worker(cache_dir):
+    env = dict(os.environ, BANK_TEMPLATE_CACHE=cache_dir)
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', WORKER], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    total = time.perf_counter() - started
+    import_seconds, ready_seconds = map(float, out.split())
+    return total, import_seconds, ready_seconds
+
+
+def summarize(samples):
+    return {
+        'median_ms': round(statistics.median(samples) * 1000, 2),
+        'min_ms': round(min(samples) * 1000, 2),
+        'max_ms': round(max(samples) * 1000, 2),
+    }
+
+
+def run(runs):
+    cache_dir = tempfile.mkdtemp(prefix='bank-jinja-')
+    try:
+        results = {}
+        for label, clear in (('cold_cache', True), ('warm_cache', False)):
+            totals, imports, ready = [], [], []
+            for _ in range(runs):
+                if clear:
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                total, import_seconds, ready_seconds = boot_worker(cache_dir)
+                totals.append(total)
+                imports.append(import_seconds)
+                ready.append(ready_seconds)
+            results[label] = {
+                'process': summarize(totals),
+                'import_app': summarize(imports),
+                'first_render': summarize(ready),
+            }
+        return results
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+    print(json.dumps({'runs': args.runs, 'results': run(args.runs)}, indent=2))
@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+import threading
+import time
+from collections import defaultdict
+
+import money
+from postings import AccountNotFound, balance, debit
+
+# Payroll-style payouts from one account to many. A batch is validated
+# and posted as one operation inside the caller's transaction: recipients
+# are checked with a single set-based query, the sender is debited once
+# for the total, and balance updates and transaction rows are written
+# with executemany. Invalid lines are rejected individually; if the
+# sender can't cover the total of the valid lines, nothing is posted.
+MAX_LINES = 100000
+
+
+class BulkTransferError(ValueError):
+    """The upload itself is unusable (bad format, too many lines, total too large)"""
+
+
+def parse_json(data):
+    """Lines from {"transfers": [{"to_account": ..., "amount": ...}, ...]} or a bare list"""
+    lines = data.get('transfers') if isinstance(data, dict) else data
+    if not isinstance(lines, list):
+        raise BulkTransferError("Expected a list of transfers")
+    return [(line.get('to_account'), line.get('amount')) if isinstance(line, dict) else (None, None)
+            for line in lines]
+
+
+def parse_csv(text):
+    """Lines from CSV with a to_account,amount header"""
+    reader = csv.reader(io.StringIO(text))
+    header = [column.strip().lower() for column in next(reader, [])]
+    if 'to_account' not in header or 'amount' not in header:
+        raise BulkTransferError("CSV needs a header with to_account and amount columns")
+    account_column = header.index('to_account')
+    amount_column = header.index('amount')
+    width = max(account_column, amount_column)
+    return [(row[account_column], row[amount_column]) if len(row) > width else (None, None)
+            for row in reader if row]
+
+
+class BulkTransferEngine:
+    """Validates and posts bulk transfers; see the module comment"""
+
+    def __init__(self, max_lines=MAX_LINES):
+        self.max_lines = max_lines
+        self._lock = threading.Lock()
+        self._metrics = {
+            'batches': 0,
+            'lines': 0,
+            'rejected_lines': 0,
+            'seconds_total': 0.0,
+        }
+
+    def _validate(self, from_account, lines):
+        """Per-line results, with amounts parsed; errors for malformed lines"""
+        results = []
+        for number, (to_account, amount) in enumerate(lines, 1):
+            result = {'line': number, 'to_account': str(to_account or '').strip(), 'status': 'ok'}
+            try:
+                paise = money.parse_amount(amount if amount is not None else '')
+            except ValueError as e:
+                paise, result['error'] = None, str(e)
+            if not result['to_account']:
+                result['error'] = "Missing to_account"
+            elif result['to_account'] == from_account:
+                result['error'] = "Cannot transfer to your own account"
+            elif paise is not None and paise <= 0:
+                result['error'] = "Transfer amount must be positive"
+            result['amount'] = paise
+            if 'error' in result:
+                result['status'] = 'rejected'
+            results.append(result)
+        return results
+
+    def apply(self, conn, from_account, lines):
+        """Post a batch inside the caller's open transaction; returns the report"""
+        started = time.perf_counter()
+        if len(lines) > self.max_lines:
+            raise BulkTransferError(f"At most {self.max_lines} lines per batch")
+        sender_balance = balance(conn, from_account)
+        if sender_balance is None:
+            raise AccountNotFound("Account not found")
+
+        results = self._validate(from_account, lines)
+        candidates = {r['to_account'] for r in results if r['status'] == 'ok'}
+        # One query checks every recipient, however many lines there are,
+        # and fetches the balances their running balances start from
+        existing = dict(conn.execute(
+            '''SELECT a.account_number, a.balance FROM json_each(?) AS j
+               JOIN accounts AS a ON a.account_number = j.value''',
+            (json.dumps(sorted(candidates)),)).fetchall())
+
+        accepted = []
+        for result in results:
+            if result['status'] == 'ok' and result['to_account'] not in existing:
+                result['status'] = 'rejected'
+                result['error'] = "Recipient account not found"
+            if result['status'] == 'ok':
+                accepted.append(result)
+
+        total = sum(result['amount'] for result in accepted)
+        # Each line is capped at MAX_AMOUNT but the sum isn't; past it the
+        # total would no longer fit SQLite's 64-bit integers
+        if total > money.MAX_AMOUNT:
+            raise BulkTransferError(f"Batch total cannot exceed {money.format_amount(money.MAX_AMOUNT)}")
+        if accepted:
+            debit(conn, from_account, total)
+            credits = defaultdict(int)
+            for result in accepted:
+                credits[result['to_account']] += result['amount']
+            conn.executemany("UPDATE accounts SET balance = balance + ? WHERE account_number = ?",
+                             [(amount, account) for account, amount in credits.items()])
+            rows = []
+            for result in accepted:
+                sender_balance -= result['amount']
+                existing[result['to_account']] += result['amount']
+                rows.append((from_account, 'Transfer Sent', result['amount'], result['to_account'],
+                             sender_balance))
+                rows.append((result['to_account'], 'Transfer Received', result['amount'], from_account,
+                             existing[result['to_account']]))
+            conn.executemany('''INSERT INTO transactions (account_number, type, amount, related_account,
+                                                          running_balance)
+                                VALUES (?, ?, ?, ?, ?)''', rows)
+
+        rejected = len(results) - len(accepted)
+        with self._lock:
+            self._metrics['batches'] += 1
+            self._metrics['lines'] += len(results)
+            self._metrics['rejected_lines'] += rejected
+            self._metrics['seconds_total'] += time.perf_counter() - started
+        return {
+            'from_account': from_account,
+            'lines': len(results),
+            'accepted': len(accepted),
+            'rejected': rejected,
+            'total': total,
+            'balance': balance(conn, from_account),
+            'results': results,
+        }
+
+    def stats(self):
+        with self._lock:
+            return dict(self._metrics)
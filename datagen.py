@@ -0,0 +1,358 @@
+import argparse
+import calendar
+import itertools
+import os
+import time
+from datetime import datetime
+
+import account_numbers
+import incremental_backup
+import migrations
+import storage
+from passwords import hash_password
+
+try:
+    import numpy
+except ImportError:  # only this tool needs it
+    numpy = None
+
+# Synthetic bank-scale datasets for testing indexes, archiving and
+# reconciliation. Rows are generated with NumPy a chunk at a time and
+# written straight to a new bank.db with executemany, with the journal
+# and fsync off, and without the transactions indexes and change log
+# triggers, which are rebuilt once at the end.
+#
+# Everything is drawn from per-chunk generators seeded with (seed, chunk),
+# so the same arguments (chunk size included) always produce the same
+# database. Transactions are generated twice: the first pass finds how far
+# each account would dip below zero, so its opening deposit can cover it
+# and every running balance stays non-negative; the second pass writes
+# the rows.
+CHUNK_SIZE = 250000
+# Rows per INSERT statement; one statement binding many rows costs far
+# less per row than executemany stepping a one-row statement
+ROWS_PER_INSERT = 64
+DEFAULT_MIX = 'deposit=0.35,withdrawal=0.25,transfer=0.4'
+PASSWORD = 'password'
+
+LOAD_PRAGMAS = (
+    "journal_mode = OFF",
+    "synchronous = OFF",
+    "locking_mode = EXCLUSIVE",
+    "temp_store = MEMORY",
+    "cache_size = -262144",
+)
+
+# Row type codes; a transfer event writes a Sent and a Received row
+DEPOSIT, WITHDRAWAL, SENT, RECEIVED = range(4)
+TYPE_NAMES = ('Deposit', 'Withdrawal', 'Transfer Sent', 'Transfer Received')
+EVENT_KINDS = ('deposit', 'withdrawal', 'transfer')
+
+# Log-normal amounts in paise: (median, sigma)
+AMOUNTS = {
+    'deposit': (500000, 1.2),
+    'withdrawal': (200000, 1.0),
+    'transfer': (150000, 1.3),
+    'opening': (1000000, 1.0),
+}
+
+
+class DatasetError(ValueError):
+    pass
+
+
+def parse_mix(text):
+    """'deposit=0.35,withdrawal=0.25,transfer=0.4' -> shares in EVENT_KINDS order"""
+    shares = dict.fromkeys(EVENT_KINDS, 0.0)
+    for part in text.split(','):
+        name, _, share = part.partition('=')
+        name = name.strip()
+        if name not in shares:
+            raise DatasetError(f"Unknown transaction kind '{name}'. Choose from: {', '.join(EVENT_KINDS)}")
+        shares[name] = float(share or 1)
+    total = sum(shares.values())
+    if total <= 0:
+        raise DatasetError("The mix needs at least one positive share")
+    return [shares[name] / total for name in EVENT_KINDS]
+
+
+def luhn_numbers(start, count):
+    """Account numbers for sequence values start..start+count-1, as strings"""
+    values = numpy.arange(start, start + count, dtype=numpy.int64)
+    total = numpy.zeros(count, dtype=numpy.int64)
+    for position in range(9):
+        digit = values // 10 ** position % 10
+        if position % 2 == 0:
+            digit = digit * 2
+            digit = numpy.where(digit > 9, digit - 9, digit)
+        total += digit
+    return (values * 10 + (10 - total % 10) % 10).astype(str).astype(object)
+
+
+def zipf_cdf(accounts, exponent, seed):
+    """Cumulative activity share per account; ranks are shuffled across accounts"""
+    rng = numpy.random.default_rng([seed, 0])
+    weights = numpy.empty(accounts)
+    weights[rng.permutation(accounts)] = 1.0 / numpy.arange(1, accounts + 1) ** exponent
+    cdf = numpy.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def _amounts(rng, kind, size):
+    median, sigma = AMOUNTS[kind]
+    return numpy.clip(numpy.rint(rng.lognormal(numpy.log(median), sigma, size)), 100, 10 ** 10).astype(numpy.int64)
+
+
+class Generator:
+    """Deterministic chunks of transaction rows for one set of parameters"""
+
+    def __init__(self, accounts, events, seed, mix, exponent, contacts, contact_share, start, end):
+        self.accounts = accounts
+        self.events = events
+        self.seed = seed
+        self.mix = numpy.cumsum(mix)
+        self.contacts = contacts
+        self.contact_share = contact_share
+        self.start = start
+        self.span = end - start
+        self.cdf = zipf_cdf(accounts, exponent, seed)
+
+    def _pick(self, rng, size):
+        return numpy.minimum(numpy.searchsorted(self.cdf, rng.random(size), side='right'), self.accounts - 1)
+
+    def _recipients(self, rng, senders):
+        # Most transfers go to one of the sender's few regular payees; the
+        # rest go to popular accounts (employers, merchants, landlords)
+        size = len(senders)
+        slot = rng.integers(1, self.contacts + 1, size)
+        payee = (senders * 2654435761 + slot * 40503) % self.accounts
+        recipients = numpy.where(rng.random(size) < self.contact_share, payee, self._pick(rng, size))
+        return numpy.where(recipients == senders, (recipients + 1) % self.accounts, recipients)
+
+    def chunk(self, index, size=CHUNK_SIZE):
+        """Rows for events [index * size, ...): (codes, types, signed, related, epochs)"""
+        first = index * size
+        size = min(size, self.events - first)
+        rng = numpy.random.default_rng([self.seed, 1, index])
+        kinds = numpy.searchsorted(self.mix, rng.random(size), side='right').clip(0, 2)
+        senders = self._pick(rng, size)
+        amounts = numpy.empty(size, dtype=numpy.int64)
+        for code, kind in enumerate(EVENT_KINDS):
+            mask = kinds == code
+            amounts[mask] = _amounts(rng, kind, int(mask.sum()))
+        recipients = self._recipients(rng, senders)
+        # Evenly spread over the period with jitter, so time never goes backwards
+        epochs = self.start + ((first + numpy.arange(size) + rng.random(size)) * self.span // self.events).astype(
+            numpy.int64)
+
+        # Expand transfers into a Sent row followed by a Received row
+        counts = numpy.where(kinds == 2, 2, 1)
+        event = numpy.repeat(numpy.arange(size), counts)
+        second = numpy.ones(len(event), dtype=bool)
+        second[numpy.cumsum(counts) - counts] = False
+        transfer = kinds[event] == 2
+        codes = numpy.where(second, recipients[event], senders[event])
+        related = numpy.where(transfer, numpy.where(second, senders[event], recipients[event]), -1)
+        types = numpy.where(transfer, numpy.where(second, RECEIVED, SENT), kinds[event])
+        signed = numpy.where((types == WITHDRAWAL) | (types == SENT), -amounts[event], amounts[event])
+        return codes, types, signed, related, epochs[event]
+
+    def chunks(self, size=CHUNK_SIZE):
+        return (self.chunk(index, size) for index in range((self.events + size - 1) // size))
+
+
+def running_totals(codes, signed, carry):
+    """Each row's account total after it, continuing from `carry` per account.
+
+    Returns (totals in row order, accounts touched, their lowest total).
+    """
+    order = numpy.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    sums = numpy.cumsum(signed[order])
+    starts = numpy.flatnonzero(numpy.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    # Restart the cumulative sum at every account, from its carried total
+    before = sums[starts] - signed[order][starts]
+    group = numpy.repeat(numpy.arange(len(starts)), numpy.diff(numpy.r_[starts, len(codes)]))
+    running = sums - before[group] + carry[sorted_codes[starts]][group]
+    totals = numpy.empty_like(running)
+    totals[order] = running
+    touched = sorted_codes[starts]
+    lowest = numpy.minimum.reduceat(running, starts)
+    carry[touched] = running[numpy.r_[starts[1:], len(codes)] - 1]
+    return totals, touched, lowest
+
+
+def timestamp_formatter(start, end):
+    """Function formatting epochs in [start, end] as 'YYYY-MM-DD HH:MM:SS' strings.
+
+    Dates and times of day come from lookup tables, so a whole column is
+    formatted with two array lookups and one vectorized concatenation
+    instead of SQLite's datetime() once per row.
+    """
+    first_day = start // 86400
+    days = numpy.arange(first_day, end // 86400 + 1).astype('datetime64[D]').astype(str)
+    dates = numpy.array([day + ' ' for day in days.tolist()], dtype=object)
+    seconds = numpy.arange(86400)
+    clock = numpy.array([f"{h:02d}:{m:02d}:{s:02d}" for h, m, s in
+                         zip((seconds // 3600).tolist(), (seconds // 60 % 60).tolist(), (seconds % 60).tolist())],
+                        dtype=object)
+
+    def format_epochs(epochs):
+        day, second = numpy.divmod(epochs, 86400)
+        return dates[day - first_day] + clock[second]
+    return format_epochs
+
+
+def insert_rows(conn, table, columns, values, per_statement=ROWS_PER_INSERT):
+    """Insert rows given as equal-length lists, one per column"""
+    width = len(columns)
+    row = '(' + ', '.join('?' * width) + ')'
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+    rows = len(values[0])
+    full = rows - rows % per_statement
+    flat = itertools.chain.from_iterable(zip(*values))
+    # The same iterator repeated, so each statement takes the next rows
+    statements = zip(*[itertools.islice(flat, full * width)] * (width * per_statement))
+    conn.executemany(sql + ', '.join([row] * per_statement), statements)
+    if full < rows:
+        conn.execute(sql + ', '.join([row] * (rows - full)), list(flat))
+
+
+def _indexes(conn, table):
+    return conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? "
+                        "AND sql IS NOT NULL", (table,)).fetchall()
+
+
+def generate(database, accounts, transactions, seed=42, mix=DEFAULT_MIX, zipf=1.1, contacts=8,
+             contact_share=0.8, days=365, end='2025-12-31', password=PASSWORD, chunk_size=CHUNK_SIZE,
+             progress=None):
+    """Write a new database; returns a report dict"""
+    if numpy is None:
+        raise DatasetError("datagen needs NumPy: pip install numpy")
+    if os.path.exists(database):
+        raise DatasetError(f"{database} already exists; datagen only writes new databases")
+    if accounts < 2:
+        raise DatasetError("Need at least two accounts")
+    shares = parse_mix(mix)
+    # Transfers write two rows per event
+    events = round(transactions / (1 + shares[2]))
+    end_epoch = calendar.timegm(datetime.strptime(end, '%Y-%m-%d').timetuple()) + 86399
+    start_epoch = end_epoch - days * 86400
+    generator = Generator(accounts, events, seed, shares, zipf, contacts, contact_share, start_epoch, end_epoch)
+    started = time.perf_counter()
+
+    # Pass 1: each account's final total and its lowest point
+    carry = numpy.zeros(accounts, dtype=numpy.int64)
+    lowest = numpy.zeros(accounts, dtype=numpy.int64)
+    for codes, _, signed, _, _ in generator.chunks(chunk_size):
+        _, touched, low = running_totals(codes, signed, carry)
+        lowest[touched] = numpy.minimum(lowest[touched], low)
+    openings = -lowest + _amounts(numpy.random.default_rng([seed, 2]), 'opening', accounts)
+    balances = openings + carry
+    planned = time.perf_counter()
+
+    migrations.initialize(database)
+    conn = storage.connect(database, isolation_level=None)
+    try:
+        for pragma in LOAD_PRAGMAS:
+            conn.execute(f"PRAGMA {pragma}")
+        for table in incremental_backup.TRACKED_TABLES:
+            incremental_backup.drop_change_log_triggers(conn, table)
+        indexes = _indexes(conn, 'transactions')
+        for name, _ in indexes:
+            conn.execute(f'DROP INDEX "{name}"')
+
+        conn.execute("BEGIN")
+        first = conn.execute("SELECT next_value FROM account_sequence WHERE name = ?",
+                             (account_numbers.SEQUENCE_NAME,)).fetchone()[0]
+        numbers = luhn_numbers(first, accounts)
+        conn.execute("UPDATE account_sequence SET next_value = ? WHERE name = ?",
+                     (first + accounts, account_numbers.SEQUENCE_NAME))
+        width = len(str(accounts - 1))
+        conn.executemany("INSERT INTO accounts (account_number, name, balance) VALUES (?, ?, ?)",
+                         zip(numbers.tolist(), (f"Customer {i}" for i in range(accounts)), balances.tolist()))
+        # One shared hash; a KDF run per user would take longer than the load
+        password_hash = hash_password(password)
+        conn.executemany("INSERT INTO users (username, account_number, password_hash) VALUES (?, ?, ?)",
+                         ((f"user{i:0{width}d}", number, password_hash) for i, number in enumerate(numbers.tolist())))
+        # Opening deposits, dated just before the period, so balances are
+        # the sum of their transactions
+        format_epochs = timestamp_formatter(start_epoch - 1, end_epoch)
+        opened_at = format_epochs(numpy.array([start_epoch - 1]))[0]
+        insert_rows(conn, 'transactions', ('account_number', 'type', 'amount', 'timestamp', 'running_balance'),
+                    (numbers.tolist(), ['Deposit'] * accounts, openings.tolist(), [opened_at] * accounts,
+                     openings.tolist()))
+        conn.execute("COMMIT")
+
+        # Pass 2: the same chunks again, now written with running balances
+        type_names = numpy.array(TYPE_NAMES, dtype=object)
+        related_numbers = numpy.append(numbers, None)
+        next_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM transactions").fetchone()[0]
+        carry[:] = openings
+        rows = 0
+        for codes, types, signed, related, epochs in generator.chunks(chunk_size):
+            running, _, _ = running_totals(codes, signed, carry)
+            count = len(codes)
+            conn.execute("BEGIN")
+            insert_rows(conn, 'transactions',
+                        ('id', 'account_number', 'type', 'amount', 'related_account', 'timestamp', 'running_balance'),
+                        (range(next_id, next_id + count), numbers[codes].tolist(), type_names[types].tolist(),
+                         numpy.abs(signed).tolist(), related_numbers[related].tolist(),
+                         format_epochs(epochs).tolist(), running.tolist()))
+            conn.execute("COMMIT")
+            next_id += count
+            rows += count
+            if progress:
+                progress(rows, time.perf_counter() - started)
+        loaded = time.perf_counter()
+
+        for _, sql in indexes:
+            conn.execute(sql)
+        incremental_backup.install_change_log(conn)
+        conn.execute("PRAGMA locking_mode = NORMAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        indexed = time.perf_counter()
+    finally:
+        conn.close()
+
+    load_seconds = loaded - started
+    return {
+        'database': database,
+        'accounts': accounts,
+        'transactions': rows,
+        'seed': seed,
+        'plan_seconds': round(planned - started, 3),
+        'load_seconds': round(load_seconds, 3),
+        'index_seconds': round(indexed - loaded, 3),
+        'rows_per_sec': round((accounts * 3 + rows) / load_seconds),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a large synthetic bank.db")
+    parser.add_argument('database')
+    parser.add_argument('--accounts', type=int, default=100000)
+    parser.add_argument('--transactions', type=int, default=5000000, help="transaction rows (approximate)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"event shares (default {DEFAULT_MIX})")
+    parser.add_argument('--zipf', type=float, default=1.1, help="account activity skew (default 1.1)")
+    parser.add_argument('--contacts', type=int, default=8, help="regular payees per account")
+    parser.add_argument('--contact-share', type=float, default=0.8, help="share of transfers to regular payees")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--end', default='2025-12-31', help="last day of the period (YYYY-MM-DD)")
+    parser.add_argument('--password', default=PASSWORD, help="password of every generated user")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="events per transaction")
+    args = parser.parse_args()
+
+    def progress(rows, seconds):
+        print(f"  {rows} transactions, {rows / seconds:.0f} rows/s", flush=True)
+
+    try:
+        report = generate(args.database, args.accounts, args.transactions, args.seed, args.mix, args.zipf,
+                          args.contacts, args.contact_share, args.days, args.end, args.password,
+                          args.chunk_size, progress)
+    except DatasetError as e:
+        raise SystemExit(str(e))
+    print(f"Wrote {report['accounts']} accounts and {report['transactions']} transactions to "
+          f"{report['database']} in {report['load_seconds']}s ({report['rows_per_sec']} rows/s); "
+          f"indexes took {report['index_seconds']}s")
@@ -0,0 +1,162 @@
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free in time"""
+
+
+class ConnectionPool:
+    """Bounded pool of reusable SQLite connections.
+
+    Connections are opened lazily up to `size`, handed out one per
+    application context and returned on teardown instead of being closed.
+    """
+
+    def __init__(self, database, size=5, timeout=5.0, health_check_interval=30.0,
+                 row_factory=sqlite3.Row, on_connect=None, factory=sqlite3.Connection):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.row_factory = row_factory
+        self.on_connect = on_connect
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._last_used = {}
+        self._metrics = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'connections_opened': 0,
+            'connections_recycled': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, check_same_thread=False, factory=self.factory)
+        conn.row_factory = self.row_factory
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        with self._lock:
+            self._metrics['connections_opened'] += 1
+        return conn
+
+    def _is_healthy(self, conn):
+        """Cheap liveness probe for connections that sat idle for a while"""
+        if time.monotonic() - self._last_used.get(id(conn), 0) < self.health_check_interval:
+            return True
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._opened -= 1
+            self._metrics['connections_recycled'] += 1
+
+    def acquire(self):
+        """Check out a connection, opening a new one if the pool has room"""
+        started = time.monotonic()
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+                with self._lock:
+                    if self._opened < self.size:
+                        self._opened += 1
+                        create = True
+                    else:
+                        create = False
+                if create:
+                    try:
+                        conn = self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._opened -= 1
+                        raise
+                else:
+                    remaining = self.timeout - (time.monotonic() - started)
+                    try:
+                        conn = self._idle.get(timeout=max(remaining, 0))
+                    except queue.Empty:
+                        with self._lock:
+                            self._metrics['timeouts'] += 1
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s")
+
+            if self._is_healthy(conn):
+                break
+            self._discard(conn)
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._metrics['checkouts'] += 1
+            self._metrics['wait_seconds_total'] += waited
+            self._metrics['wait_seconds_max'] = max(self._metrics['wait_seconds_max'], waited)
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back anything left open"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        self._last_used[id(conn)] = time.monotonic()
+        self._idle.put(conn)
+
+    def close_all(self):
+        """Close the idle connections; registered to run at exit by init_app"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+    def stats(self):
+        """Snapshot of pool usage for sizing"""
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot['size'] = self.size
+            snapshot['open'] = self._opened
+        snapshot['idle'] = self._idle.qsize()
+        snapshot['in_use'] = snapshot['open'] - snapshot['idle']
+        checkouts = snapshot['checkouts']
+        snapshot['wait_seconds_avg'] = snapshot['wait_seconds_total'] / checkouts if checkouts else 0.0
+        return snapshot
+
+    def init_app(self, app):
+        """Hand one connection to each app context and return it on teardown"""
+        from flask import g
+
+        def teardown(exc):
+            conn = g.pop('db', None)
+            if conn is not None:
+                self.release(conn)
+
+        app.teardown_appcontext(teardown)
+        app.extensions['db_pool'] = self
+        atexit.register(self.close_all)
+
+    def get(self):
+        """Connection bound to the current Flask app context"""
+        from flask import g
+
+        if 'db' not in g:
+            g.db = self.acquire()
+        return g.db
@@ -0,0 +1,51 @@
+from functools import lru_cache
+
+# Digit groups, precomputed so formatting is table lookups. _HEADS is
+# everything left of the last three digits for amounts under 1 crore
+# rupees, already grouped; _QUADS pads two pairs for larger amounts. The
+# tables take about 1.3 MB.
+_PAIRS = [f"{i:02d}" for i in range(100)]
+_TRIPLES = [f"{i:03d}" for i in range(1000)]
+_SMALL = [str(i) for i in range(1000)]
+_HEADS = [f"{i // 100},{i % 100:02d}" if i >= 100 else str(i) for i in range(10000)]
+_QUADS = [f"{i // 100:02d},{i % 100:02d}" for i in range(10000)]
+
+
+def _group_indian(rupees):
+    """Insert lakh/crore separators: last three digits, then pairs"""
+    if rupees < 1000:
+        return _SMALL[rupees]
+    head, tail = divmod(rupees, 1000)
+    if head < 10000:
+        return _HEADS[head] + ',' + _TRIPLES[tail]
+    text = ',' + _TRIPLES[tail]
+    while head >= 10000:
+        head, quad = divmod(head, 10000)
+        text = ',' + _QUADS[quad] + text
+    return _HEADS[head] + text
+
+
+def _format(paise):
+    if paise < 0:
+        rupees, remainder = divmod(-paise, 100)
+        return '-' + _group_indian(rupees) + '.' + _PAIRS[remainder]
+    rupees, remainder = divmod(paise, 100)
+    return _group_indian(rupees) + '.' + _PAIRS[remainder]
+
+
+@lru_cache(maxsize=4096)
+def format_indian(paise):
+    """Format an amount in paise the Indian way, e.g. 1,23,45,678.90"""
+    return _format(int(paise))
+
+
+def format_indian_batch(values):
+    """Format a whole column of paise amounts, formatting each distinct value once"""
+    seen = {}
+    out = []
+    for value in values:
+        text = seen.get(value)
+        if text is None:
+            text = seen[value] = format_indian(value)
+        out.append(text)
+    return out
@@ -0,0 +1,48 @@
+import base64
+import binascii
+
+HISTORY_COLUMNS = 'id, type, amount, related_account, timestamp'
+
+
+def encode_cursor(timestamp, row_id):
+    """Opaque page token pointing just past the given row"""
+    raw = f"{timestamp}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Turn a page token back into (timestamp, id); ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded.encode()).decode().rsplit('|', 1)
+        return timestamp, int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid page cursor")
+
+
+def fetch_page(conn, account_number, cursor=None, limit=20):
+    """Fetch one page of an account's history, newest first.
+
+    Uses keyset pagination on (timestamp, id) instead of OFFSET, so every
+    page is a single index seek no matter how deep it is. Returns the rows
+    and the cursor for the next page (None on the last page).
+    """
+    if cursor is None:
+        rows = conn.execute(f'''SELECT {HISTORY_COLUMNS} FROM transactions
+                               WHERE account_number = ?
+                               ORDER BY timestamp DESC, id DESC LIMIT ?''',
+                            (account_number, limit + 1)).fetchall()
+    else:
+        timestamp, row_id = decode_cursor(cursor)
+        rows = conn.execute(f'''SELECT {HISTORY_COLUMNS} FROM transactions
+                               WHERE account_number = ? AND (timestamp, id) < (?, ?)
+                               ORDER BY timestamp DESC, id DESC LIMIT ?''',
+                            (account_number, timestamp, row_id, limit + 1)).fetchall()
+
+    # One extra row tells us whether another page exists
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[4], last[0])
+    return rows, next_cursor
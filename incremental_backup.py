@@ -0,0 +1,277 @@
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import backup
+import storage
+
+# Incremental backups: a full base snapshot plus change-log segments.
+#
+# Triggers append every row change to change_log. ship_segment() moves new
+# change_log rows into a compressed NDJSON segment file and prunes them, so
+# backup I/O follows the change rate instead of the database size.
+# restore() copies the newest base taken before the target time and replays
+# segment entries up to that time.
+TRACKED_TABLES = ('accounts', 'users', 'transactions', 'balance_checkpoints')
+MANIFEST = 'manifest.json'
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _columns(conn, table):
+    """(columns, primary key columns) of a table"""
+    info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    columns = [row[1] for row in info]
+    key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+    return columns, key
+
+
+def _tracked(conn):
+    """Tracked tables that exist; later migrations add some of them"""
+    return [table for table in TRACKED_TABLES if conn.execute(f"PRAGMA table_info({table})").fetchone()]
+
+
+def _row_key(prefix, key):
+    # A composite key is logged as a JSON array of its values
+    if len(key) == 1:
+        return f"{prefix}.{key[0]}"
+    return "json_array(" + ", ".join(f"{prefix}.{c}" for c in key) + ")"
+
+
+def _key_values(change, key):
+    return json.loads(change['key']) if len(key) > 1 else [change['key']]
+
+
+def install_change_log(conn):
+    """Create change_log and (re)create its triggers from the current columns.
+
+    Run again after any migration that adds columns to a tracked table.
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS change_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+                    table_name TEXT NOT NULL,
+                    op TEXT NOT NULL,
+                    row_key TEXT NOT NULL,
+                    row_data TEXT)''')
+    for table in _tracked(conn):
+        columns, key = _columns(conn, table)
+        row_json = "json_object(" + ", ".join(f"'{c}', NEW.{c}" for c in columns) + ")"
+        drop_change_log_triggers(conn, table)
+        conn.execute(f'''CREATE TRIGGER change_log_{table}_insert AFTER INSERT ON {table} BEGIN
+                         INSERT INTO change_log (table_name, op, row_key, row_data)
+                         VALUES ('{table}', 'I', {_row_key('NEW', key)}, {row_json}); END''')
+        conn.execute(f'''CREATE TRIGGER change_log_{table}_update AFTER UPDATE ON {table} BEGIN
+                         INSERT INTO change_log (table_name, op, row_key, row_data)
+                         VALUES ('{table}', 'U', {_row_key('OLD', key)}, {row_json}); END''')
+        conn.execute(f'''CREATE TRIGGER change_log_{table}_delete AFTER DELETE ON {table} BEGIN
+                         INSERT INTO change_log (table_name, op, row_key, row_data)
+                         VALUES ('{table}', 'D', {_row_key('OLD', key)}, NULL); END''')
+
+
+def drop_change_log_triggers(conn, table):
+    for op in ('insert', 'update', 'delete'):
+        conn.execute(f"DROP TRIGGER IF EXISTS change_log_{table}_{op}")
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime(TIME_FORMAT)
+
+
+def load_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {'bases': [], 'segments': [], 'shipped_through': 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(directory, manifest):
+    fd, temp = tempfile.mkstemp(dir=directory, prefix=MANIFEST + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp, os.path.join(directory, MANIFEST))
+    except BaseException:
+        os.remove(temp)
+        raise
+
+
+def take_base(source="bank.db", directory="backups", compress='gzip'):
+    """Full snapshot that later segments are replayed on top of"""
+    os.makedirs(directory, exist_ok=True)
+    result = backup.backup_database(source, directory, compress=compress, prefix='bank_base_',
+                                    snapshot_sql="SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
+    # Changes up to this id are inside the base; replay starts after it
+    change_seq = result['snapshot'][0] if result['snapshot'] else 0
+    manifest = load_manifest(directory)
+    manifest['bases'].append({'path': os.path.basename(result['path']),
+                              'taken_at': _now(),
+                              'change_seq': change_seq})
+    _save_manifest(directory, manifest)
+    return result
+
+
+def ship_segment(source="bank.db", directory="backups", batch_size=5000):
+    """Write new change_log rows to a segment file and prune them.
+
+    Returns the segment's manifest entry, or None if nothing changed.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = load_manifest(directory)
+    conn = storage.connect(source)
+    try:
+        cursor = conn.execute('''SELECT id, changed_at, table_name, op, row_key, row_data
+                                 FROM change_log WHERE id > ? ORDER BY id''',
+                              (manifest['shipped_through'],))
+        first = last = None
+        count = 0
+        # A unique temp name so concurrent runs don't write into each other's file
+        fd, temp = tempfile.mkstemp(dir=directory, prefix='segment.', suffix='.tmp')
+        os.close(fd)
+        try:
+            with gzip.open(temp, 'wt', encoding='utf-8') as out:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        out.write(json.dumps({'id': row[0], 'at': row[1], 'table': row[2], 'op': row[3],
+                                              'key': row[4], 'row': json.loads(row[5]) if row[5] else None}))
+                        out.write('\n')
+                    if first is None:
+                        first = rows[0]
+                    last = rows[-1]
+                    count += len(rows)
+            if count:
+                name = f"bank_changes_{first[0]:012d}_{last[0]:012d}.ndjson.gz"
+                os.replace(temp, os.path.join(directory, name))
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+        if not count:
+            return None
+
+        entry = {'path': name, 'first_id': first[0], 'last_id': last[0],
+                 'first_at': first[1], 'last_at': last[1], 'changes': count}
+        manifest['segments'].append(entry)
+        manifest['shipped_through'] = last[0]
+        _save_manifest(directory, manifest)
+
+        # Only prune once the segment and manifest are durable
+        conn.execute("DELETE FROM change_log WHERE id <= ?", (last[0],))
+        conn.commit()
+        return entry
+    finally:
+        conn.close()
+
+
+def run_backup(source="bank.db", directory="backups", base_every_days=7, compress='gzip'):
+    """Ship a segment, taking a new base first if the last one is too old"""
+    manifest = load_manifest(directory)
+    if manifest['bases']:
+        last_base = datetime.strptime(manifest['bases'][-1]['taken_at'], TIME_FORMAT)
+        if datetime.now(timezone.utc).replace(tzinfo=None) - last_base < timedelta(days=base_every_days):
+            return 'segment', ship_segment(source, directory)
+    # Ship what's pending first so no change is only in a pruned log
+    ship_segment(source, directory)
+    return 'base', take_base(source, directory, compress)
+
+
+def _open_base(directory, base, output):
+    path = os.path.join(directory, base['path'])
+    if path.endswith('.gz'):
+        with gzip.open(path, 'rb') as src, open(output, 'wb') as dst:
+            shutil.copyfileobj(src, dst, backup.CHUNK_SIZE)
+    elif path.endswith('.zst'):
+        if backup.zstandard is None:
+            raise backup.BackupError("zstd backups need the 'zstandard' package")
+        with open(path, 'rb') as src, open(output, 'wb') as dst:
+            backup.zstandard.ZstdDecompressor().copy_stream(src, dst)
+    else:
+        shutil.copyfile(path, output)
+
+
+def _apply(conn, change, keys):
+    table = change['table']
+    key = keys[table]
+    where = ' AND '.join(f"{c} = ?" for c in key)
+    old = _key_values(change, key)
+    if change['op'] == 'D':
+        conn.execute(f"DELETE FROM {table} WHERE {where}", old)
+        return
+    row = change['row']
+    if change['op'] == 'U' and [str(row[c]) for c in key] != [str(v) for v in old]:
+        conn.execute(f"DELETE FROM {table} WHERE {where}", old)
+    columns = ', '.join(row)
+    placeholders = ', '.join('?' for _ in row)
+    conn.execute(f"INSERT OR REPLACE INTO {table} ({columns}) VALUES ({placeholders})", tuple(row.values()))
+
+
+def restore(directory, target_time, output):
+    """Rebuild the database as of target_time (UTC, 'YYYY-MM-DD HH:MM:SS')"""
+    target = datetime.strptime(target_time, TIME_FORMAT).strftime(TIME_FORMAT)
+    manifest = load_manifest(directory)
+    bases = [base for base in manifest['bases'] if base['taken_at'] <= target]
+    if not bases:
+        raise backup.BackupError(f"No base backup was taken before {target}")
+    base = bases[-1]
+
+    if os.path.exists(output):
+        raise backup.BackupError(f"{output} already exists")
+    _open_base(directory, base, output)
+
+    conn = sqlite3.connect(output)
+    replayed = 0
+    try:
+        keys = {table: _columns(conn, table)[1] for table in _tracked(conn)}
+        for table in keys:
+            drop_change_log_triggers(conn, table)
+        # Segments are in id order; a change committed at exactly `target` is included
+        for segment in manifest['segments']:
+            if segment['last_id'] <= base['change_seq'] or segment['first_at'][:19] > target:
+                continue
+            with gzip.open(os.path.join(directory, segment['path']), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    change = json.loads(line)
+                    if change['id'] <= base['change_seq']:
+                        continue
+                    if change['at'][:19] > target:
+                        break
+                    _apply(conn, change, keys)
+                    replayed += 1
+        conn.execute("DELETE FROM change_log")
+        install_change_log(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    return {'base': base['path'], 'replayed': replayed, 'output': output}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental backups and point-in-time restore")
+    parser.add_argument('--directory', default='backups')
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('base', 'ship', 'run'):
+        cmd = sub.add_parser(name)
+        cmd.add_argument('source', nargs='?', default='bank.db')
+    cmd = sub.add_parser('restore')
+    cmd.add_argument('target_time', help="UTC time, e.g. '2024-01-31 18:00:00'")
+    cmd.add_argument('--output', default='bank_restored.db')
+    args = parser.parse_args()
+
+    if args.command == 'base':
+        print(f"Base backup written to {take_base(args.source, args.directory)['path']}")
+    elif args.command == 'ship':
+        entry = ship_segment(args.source, args.directory)
+        print(f"Shipped {entry['changes']} changes to {entry['path']}" if entry else "No new changes.")
+    elif args.command == 'run':
+        kind, result = run_backup(args.source, args.directory)
+        print(f"Took {kind} backup: {result}")
+    else:
+        result = restore(args.directory, args.target_time, args.output)
+        print(f"Restored {result['output']} from {result['base']} + {result['replayed']} changes")
@@ -0,0 +1,359 @@
+import bisect
+import hmac
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache, wraps
+
+# In-process metrics in the Prometheus text format.
+#
+# Recording never takes a lock: every thread increments its own list of
+# values, and a scrape sums the lists. Histograms have fixed buckets, so
+# an observation is a bisect and two list increments. Locks are only
+# taken the first time a thread or a label combination is seen, and while
+# rendering.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+
+class _Shards:
+    """Per-thread value lists; writers never contend, readers sum them"""
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._live = []
+        self._retired = [0] * size
+
+    def mine(self):
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = [0] * self.size
+            self._local.values = values
+            with self._lock:
+                self._live.append((threading.current_thread(), values))
+        return values
+
+    def totals(self):
+        with self._lock:
+            # Fold in threads that have exited so the list stays short
+            live = []
+            for thread, values in self._live:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    self._retired = [a + b for a, b in zip(self._retired, values)]
+            self._live = live
+            totals = list(self._retired)
+            for _, values in live:
+                totals = [a + b for a, b in zip(totals, values)]
+        return totals
+
+
+class Counter:
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount=1):
+        self._shards.mine()[0] += amount
+
+    def value(self):
+        return self._shards.totals()[0]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        # One slot per bucket, one for +Inf, then the sum
+        self._shards = _Shards(len(self.buckets) + 2)
+
+    def observe(self, value):
+        values = self._shards.mine()
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def snapshot(self):
+        """(cumulative bucket counts including +Inf, count, sum)"""
+        totals = self._shards.totals()
+        cumulative = []
+        running = 0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, totals[-1]
+
+
+class Family:
+    """A named metric with labels; children are created on first use"""
+
+    def __init__(self, registry, kind, name, help_text, labels, make):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._make = make
+        self._children = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def child(self, *values):
+        metric = self._children.get(values)
+        if metric is None:
+            with self._lock:
+                metric = self._children.setdefault(values, self._make())
+        return metric
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, metric in children:
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values))
+            if self.kind == 'counter':
+                lines.append(f"{self.name}{{{labels}}} {_number(metric.value())}")
+                continue
+            cumulative, count, total = metric.snapshot()
+            sep = ',' if labels else ''
+            for bound, running in zip(metric.buckets + (float('inf'),), cumulative):
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{le}"}} {running}')
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+            lines.append(f"{self.name}_sum{{{labels}}} {_number(total)}")
+        return lines
+
+
+class Gauge:
+    """A value read from a callback at scrape time"""
+
+    def __init__(self, registry, name, help_text, read):
+        self.name = name
+        self.help = help_text
+        self.read = read
+        registry.register(self)
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_number(self.read())}"]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def counter(self, name, help_text, labels=()):
+        return Family(self, 'counter', name, help_text, labels, Counter)
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return Family(self, 'histogram', name, help_text, labels, lambda: Histogram(buckets))
+
+    def gauge(self, name, help_text, read):
+        return Gauge(self, name, help_text, read)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'bank_http_request_duration_seconds', "Time spent handling a request", ('endpoint', 'method'))
+HTTP_REQUEST_SQL_SECONDS = REGISTRY.histogram(
+    'bank_http_request_sql_seconds', "Time a request spent in SQL", ('endpoint', 'method'))
+HTTP_RESPONSES = REGISTRY.counter(
+    'bank_http_responses_total', "Responses sent", ('endpoint', 'method', 'status'))
+SQL_STATEMENT_SECONDS = REGISTRY.histogram(
+    'bank_sql_statement_duration_seconds', "Time to execute a statement", ('operation',), SQL_BUCKETS)
+SQL_FETCH_SECONDS = REGISTRY.counter(
+    'bank_sql_fetch_seconds_total', "Time spent fetching result rows", ('operation',))
+SQL_ROWS = REGISTRY.counter(
+    'bank_sql_rows_total', "Rows returned by reads or changed by writes", ('operation',))
+CLI_OPERATION_SECONDS = REGISTRY.histogram(
+    'bank_cli_operation_duration_seconds', "Time spent in a Bank method", ('operation',))
+
+# SQL time spent by the current thread since the last reset, for the
+# per-request split between SQL and everything else
+_sql_time = threading.local()
+
+
+def sql_seconds(reset=False):
+    spent = getattr(_sql_time, 'seconds', 0.0)
+    if reset:
+        _sql_time.seconds = 0.0
+    return spent
+
+
+@lru_cache(maxsize=4096)
+def _sql_metrics(sql):
+    """(operation, statement histogram, fetch seconds, rows) for a statement"""
+    words = sql.lstrip().split(None, 1)
+    operation = words[0].upper() if words else 'EMPTY'
+    return (operation, SQL_STATEMENT_SECONDS.child(operation), SQL_FETCH_SECONDS.child(operation),
+            SQL_ROWS.child(operation))
+
+
+_READS = ('SELECT', 'WITH', 'PRAGMA', 'EXPLAIN')
+
+# A slowlog.SlowQueryLog, set with log_slow_queries()
+_slow_log = None
+
+
+def log_slow_queries(log):
+    """Send statements slower than log.threshold to `log`; None turns it off"""
+    global _slow_log
+    _slow_log = log
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times statements and fetches and counts rows"""
+
+    _metrics = None
+
+    def _timed(self, run, sql, parameters, many=False):
+        self._metrics = metrics = _sql_metrics(sql)
+        started = time.perf_counter()
+        try:
+            return run(sql, parameters)
+        finally:
+            seconds = time.perf_counter() - started
+            metrics[1].observe(seconds)
+            _sql_time.seconds = getattr(_sql_time, 'seconds', 0.0) + seconds
+            if metrics[0] not in _READS and self.rowcount > 0:
+                metrics[3].inc(self.rowcount)
+            slow_log = _slow_log
+            if slow_log is not None and seconds >= slow_log.threshold:
+                if many:
+                    # A generator has been used up; a list still has its first row
+                    parameters = parameters[0] if isinstance(parameters, (list, tuple)) and parameters else None
+                slow_log.record(self, sql, parameters, seconds, many)
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters, many=True)
+
+    def _fetched(self, started, rows):
+        seconds = time.perf_counter() - started
+        _sql_time.seconds = getattr(_sql_time, 'seconds', 0.0) + seconds
+        if self._metrics is not None:
+            self._metrics[2].inc(seconds)
+            if rows:
+                self._metrics[3].inc(rows)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __next__(self):
+        # Rows are counted but not timed one by one
+        row = super().__next__()
+        if self._metrics is not None:
+            self._metrics[3].inc()
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Pass as `factory=` to sqlite3.connect (or storage.connect) to time every statement"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def init_app(app, path='/metrics', token=None):
+    """Time every request and serve the registry at `path`.
+
+    The registry shows traffic, SQL timings and pool state, so it is only
+    served to requests with `Authorization: Bearer <token>`. Without a
+    token (BANK_METRICS_TOKEN by default) nothing is served at `path`.
+    """
+    from flask import Response, request
+
+    token = token if token is not None else os.environ.get('BANK_METRICS_TOKEN')
+
+    @app.before_request
+    def start_timer():
+        request.metrics_started = time.perf_counter()
+        sql_seconds(reset=True)
+
+    @app.after_request
+    def record_request(response):
+        started = getattr(request, 'metrics_started', None)
+        if started is not None:
+            # Unmatched URLs share one label so scanners can't add series
+            endpoint = request.endpoint or 'unmatched'
+            HTTP_REQUEST_SECONDS.child(endpoint, request.method).observe(time.perf_counter() - started)
+            HTTP_REQUEST_SQL_SECONDS.child(endpoint, request.method).observe(sql_seconds())
+            HTTP_RESPONSES.child(endpoint, request.method, str(response.status_code)).inc()
+        return response
+
+    def serve_metrics():
+        scheme, _, presented = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(presented.encode(), token.encode()):
+            return Response("Unauthorized\n", 401, {'WWW-Authenticate': 'Bearer'})
+        return Response(REGISTRY.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+    if token:
+        app.add_url_rule(path, 'metrics', serve_metrics)
+
+
+def timed(func):
+    """Record a function's duration under bank_cli_operation_duration_seconds"""
+    histogram = CLI_OPERATION_SECONDS.child(func.__name__)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - started)
+    return wrapper
+
+
+def write_textfile(path):
+    """Write the registry for node_exporter's textfile collector"""
+    with open(path + '.tmp', 'w') as f:
+        f.write(REGISTRY.render())
+    os.replace(path + '.tmp', path)
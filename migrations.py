@@ -0,0 +1,114 @@
+import sqlite3
+import sys
+
+import account_numbers
+import balances
+import incremental_backup
+import schema
+import storage
+import tokens
+
+# Ordered schema migrations: (version, description, step). Every step runs
+# in its own transaction together with its schema_version row, so a crash
+# leaves the database at the last completed version. Steps must be safe to
+# run against databases created before versioning existed.
+MIGRATIONS = [
+    (1, "create accounts, users and transactions tables", schema.create_tables),
+    (2, "store money columns as integer paise", schema.migrate_money_to_paise),
+    # Indexes get their own step so the build holds the write lock only for
+    # its own duration; under WAL readers keep going while it runs.
+    (3, "index transactions by (account_number, timestamp, id)", schema.create_indexes),
+    (4, "seed sample test account", schema.seed_test_account),
+    (5, "add account number sequence", account_numbers.create_sequence),
+    (6, "record row changes for incremental backups", incremental_backup.install_change_log),
+    (7, "add revoked token table", tokens.create_revocation_table),
+    # Existing rows keep a NULL running balance until `balances.py backfill`
+    (8, "add running balances and balance checkpoints", balances.add_running_balance),
+    (9, "record balance checkpoint changes for incremental backups", incremental_backup.install_change_log),
+    (10, "post opening balances as deposits", balances.record_opening_deposits),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """Schema version recorded in the database, 0 if unversioned"""
+    try:
+        version = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    return version or 0
+
+
+def pending_migrations(conn):
+    version = current_version(conn)
+    return [(v, description, step) for v, description, step in MIGRATIONS if v > version]
+
+
+def migrate(conn, dry_run=False):
+    """Bring the database up to LATEST_VERSION.
+
+    An up-to-date database costs a single version lookup. Returns the
+    (version, description) pairs applied, or that would be applied when
+    dry_run is set.
+    """
+    if current_version(conn) >= LATEST_VERSION:
+        return []
+
+    pending = pending_migrations(conn)
+    if dry_run:
+        return [(version, description) for version, description, _ in pending]
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)''')
+
+    applied = []
+    for version, description, step in pending:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            if current_version(conn) >= version:
+                conn.rollback()
+                continue
+            step(conn)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                         (version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+    return applied
+
+
+def initialize(database):
+    """Open the database in WAL mode and apply pending migrations"""
+    conn = storage.connect(database)
+    try:
+        storage.enable_wal(conn)
+        return migrate(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    dry_run = '--dry-run' in sys.argv[1:]
+    paths = [arg for arg in sys.argv[1:] if arg != '--dry-run']
+    database = paths[0] if paths else "bank.db"
+
+    conn = storage.connect(database)
+    try:
+        print(f"{database}: schema version {current_version(conn)} of {LATEST_VERSION}")
+        if not dry_run:
+            storage.enable_wal(conn)
+        steps = migrate(conn, dry_run=dry_run)
+        for version, description in steps:
+            print(f"{'Would apply' if dry_run else 'Applied'} migration {version}: {description}")
+        if not steps:
+            print("Schema is up to date.")
+    finally:
+        conn.close()
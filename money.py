@@ -0,0 +1,63 @@
+from decimal import Decimal, InvalidOperation
+
+# Amounts are stored and computed as integer paise (1 rupee = 100 paise).
+# Conversion to and from rupees happens only at the input/output edges.
+PAISE_PER_RUPEE = 100
+
+# Largest amount accepted for a single posting. Far below 2**63 paise, so
+# a balance built from such postings stays an SQLite INTEGER instead of
+# silently turning into a REAL.
+MAX_AMOUNT = 10 ** 14
+
+
+def parse_amount(value):
+    """Parse a rupee amount from user input into integer paise.
+
+    Accepts strings, ints, floats and Decimals. Raises ValueError for
+    anything that isn't a finite, non-negative amount with at most two
+    decimal places and no larger than MAX_AMOUNT.
+    """
+    if isinstance(value, float):
+        value = repr(value)
+    try:
+        rupees = Decimal(str(value).strip().replace(',', ''))
+    except InvalidOperation:
+        raise ValueError("Amount must be a number")
+    if not rupees.is_finite():
+        raise ValueError("Amount must be a number")
+    if rupees < 0:
+        raise ValueError("Amount cannot be negative")
+    if rupees * PAISE_PER_RUPEE > MAX_AMOUNT:
+        raise ValueError(f"Amount cannot exceed {format_amount(MAX_AMOUNT)}")
+    paise = rupees * PAISE_PER_RUPEE
+    if paise != paise.to_integral_value():
+        raise ValueError("Amount cannot have more than two decimal places")
+    return int(paise)
+
+
+def to_rupees(paise):
+    """Exact rupee value of an amount in paise"""
+    return Decimal(int(paise)).scaleb(-2)
+
+
+def format_amount(paise):
+    """Format paise as rupees with thousands separators, e.g. 1,234.50"""
+    paise = int(paise)
+    sign = '-' if paise < 0 else ''
+    rupees, remainder = divmod(abs(paise), PAISE_PER_RUPEE)
+    return f"{sign}{rupees:,}.{remainder:02d}"
+
+
+def totals_by_type(conn, account_number=None):
+    """Exact per-type SUM of transaction amounts in paise, for reporting"""
+    if account_number is None:
+        rows = conn.execute("SELECT type, SUM(amount) FROM transactions GROUP BY type").fetchall()
+    else:
+        rows = conn.execute("SELECT type, SUM(amount) FROM transactions WHERE account_number = ? GROUP BY type",
+                            (account_number,)).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def total_balances(conn):
+    """Exact SUM of all account balances in paise"""
+    return conn.execute("SELECT COALESCE(SUM(balance), 0) FROM accounts").fetchone()[0]
@@ -1,86 +1,50 @@
-import sqlite3
-import time
 from functools import wraps
 import jwt
-from datetime import datetime, timedelta, timezone
-import hashlib
 import secrets
 import os
 
+import storage
+import migrations
+import history
+import statements
+import money
+import incremental_backup
+import ratelimit
+from ratelimit import RateLimiter, Limit
+from account_numbers import AccountNumberAllocator
+from write_pipeline import WritePipeline
+from postings import PostingError, InsufficientFunds, open_account
+from passwords import PasswordService
+from tokens import TokenService, TokenRevoked
+import metrics
+from metrics import timed
+from slowlog import SlowQueryLog
+
 # Configuration
 SECRET_KEY = secrets.token_hex(32)  # Generate a random secret key
 TOKEN_EXPIRATION_MINUTES = 30
 
-# Database Helper Functions
-def database_exists():
-    """Check if database file and tables exist"""
-    if not os.path.exists("bank.db"):
-        return False
-    
-    conn = sqlite3.connect("bank.db")
-    cursor = conn.cursor()
-    
-    try:
-        # Check if all required tables exist
-        tables = ['accounts', 'users', 'transactions']
-        for table in tables:
-            cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table}'")
-            if not cursor.fetchone():
-                return False
-        return True
-    finally:
-        conn.close()
+# Statements slower than BANK_SLOW_QUERY_MS are logged with their query plan
+metrics.log_slow_queries(SlowQueryLog(os.environ.get('BANK_SLOW_QUERY_LOG', 'slow_queries.jsonl'),
+                                      threshold=float(os.environ.get('BANK_SLOW_QUERY_MS', 100)) / 1000))
 
+# Database Helper Functions
 def initialize_database():
-    """Initialize database only if it doesn't exist"""
-    if database_exists():
-        return
-        
-    conn = sqlite3.connect("bank.db")
-    cursor = conn.cursor()
-    
-    # Create tables with proper schema (using IF NOT EXISTS)
-    cursor.execute('''CREATE TABLE IF NOT EXISTS accounts (
-                    account_number TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    balance REAL)''')
-    
-    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-                    username TEXT PRIMARY KEY,
-                    account_number TEXT UNIQUE,
-                    password_hash TEXT NOT NULL,
-                    FOREIGN KEY(account_number) REFERENCES accounts(account_number))''')
-    
-    cursor.execute('''CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    account_number TEXT,
-                    type TEXT,
-                    amount REAL,
-                    related_account TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(account_number) REFERENCES accounts(account_number))''')
-    
-    # Only add sample data if no users exist
-    cursor.execute("SELECT COUNT(*) FROM users")
-    if cursor.fetchone()[0] == 0:
-        cursor.execute("INSERT INTO accounts VALUES ('1234567890', 'Test User', 10000.00)")
-        cursor.execute("INSERT INTO users VALUES ('test', '1234567890', ?)", 
-                      (hashlib.sha256('test123'.encode()).hexdigest(),))
-    
-    conn.commit()
-    conn.close()
+    """Create or upgrade the database schema, keeping existing data"""
+    for version, description in migrations.initialize("bank.db"):
+        print(f"Applied migration {version}: {description}")
 
 def backup_database():
-    """Create timestamped backup of the database"""
+    """Ship changes since the last backup, taking a full base backup weekly"""
     if not os.path.exists("bank.db"):
         return
-        
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = f"bank_backup_{timestamp}.db"
-    with open("bank.db", 'rb') as original:
-        with open(backup_file, 'wb') as backup:
-            backup.write(original.read())
-    print(f"Database backed up to {backup_file}")
+    
+    kind, result = incremental_backup.run_backup("bank.db", os.environ.get('BANK_BACKUP_DIR', 'backups'),
+                                                 compress=os.environ.get('BANK_BACKUP_COMPRESSION', 'gzip'))
+    if kind == 'base':
+        print(f"Database backed up to {result['path']}")
+    elif result:
+        print(f"Backed up {result['changes']} changes to {result['path']}")
 
 # Middleware Decorators
 def authenticate(func):
@@ -89,24 +53,30 @@ def authenticate(func):
         if not hasattr(self, 'current_user') or not self.current_user:
             print("Please login first.")
             return
+        if not self._verify_token(self.token):
+            self.current_user = None
+            self.token = None
+            return
         return func(self, *args, **kwargs)
     return wrapper
 
-rate_limit_cache = {}
+# Per-operation limits, keyed by account number
+limiter = RateLimiter(ratelimit.backend_from_env(), default=Limit(5, 10), limits={
+    'transfer_money': Limit(3, 10),
+})
 
 def rate_limiter(func):
     @wraps(func)
     def wrapper(self, *args, **kwargs):
-        if not hasattr(self, 'current_user'):
+        if not getattr(self, 'current_user', None):
             account_number = "anonymous"
         else:
             account_number = self.current_user['account_number']
             
-        current_time = time.time()
-        if account_number in rate_limit_cache and current_time - rate_limit_cache[account_number] < 2:
-            print("Too many requests. Please wait.")
+        allowed, retry_after = limiter.hit(func.__name__, account_number)
+        if not allowed:
+            print(f"Too many requests. Please wait {retry_after:.0f} seconds.")
             return
-        rate_limit_cache[account_number] = current_time
         return func(self, *args, **kwargs)
     return wrapper
 
@@ -121,44 +91,56 @@ def error_handler(func):
 
 class Bank:
     def __init__(self):
-        self.conn = sqlite3.connect("bank.db")
+        self.conn = storage.connect("bank.db", factory=metrics.InstrumentedConnection)
         self.cursor = self.conn.cursor()
+        self.account_numbers = AccountNumberAllocator("bank.db")
+        self.pipeline = WritePipeline("bank.db", factory=metrics.InstrumentedConnection)
+        # A single interactive user doesn't need a process pool
+        self.passwords = PasswordService(workers=0)
+        self.tokens = TokenService(SECRET_KEY, "bank.db")
         self.current_user = None
         self.token = None
 
     def _hash_password(self, password):
         """Hash a password for storing."""
-        return hashlib.sha256(password.encode()).hexdigest()
+        return self.passwords.hash(password)
 
     def _verify_password(self, stored_hash, provided_password):
-        """Verify a stored password against one provided by user"""
-        return stored_hash == self._hash_password(provided_password)
+        """Verify a stored password; returns (ok, upgraded_hash)"""
+        return self.passwords.verify(stored_hash, provided_password)
 
     def _generate_token(self, username, account_number):
         """Generate JWT token"""
-        expiration = datetime.now(timezone.utc) + timedelta(minutes=TOKEN_EXPIRATION_MINUTES)
         payload = {
             'username': username,
             'account_number': account_number,
-            'exp': expiration
         }
-        return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
+        return self.tokens.issue(payload, TOKEN_EXPIRATION_MINUTES)
 
     def _verify_token(self, token):
         """Verify JWT token"""
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            return payload
+            return self.tokens.verify(token)
         except jwt.ExpiredSignatureError:
             print("Token has expired. Please login again.")
             return None
+        except TokenRevoked:
+            print("Session has ended. Please login again.")
+            return None
         except jwt.InvalidTokenError:
             print("Invalid token. Please login again.")
             return None
 
+    @timed
     @error_handler
-    def register(self, username, password, name, initial_deposit=0.0):
+    def register(self, username, password, name, initial_deposit=0):
         """Register a new user with a new account"""
+        try:
+            initial_deposit = money.parse_amount(initial_deposit)
+        except ValueError as e:
+            print(e)
+            return False
+        
         # Check if username already exists
         self.cursor.execute("SELECT username FROM users WHERE username = ?", (username,))
         if self.cursor.fetchone():
@@ -166,11 +148,10 @@ class Bank:
             return False
         
         # Generate account number
-        account_number = str(int(time.time()))[-10:]  # Simple account number generation
+        account_number = self.account_numbers.allocate()
         
         # Create account
-        self.cursor.execute("INSERT INTO accounts VALUES (?, ?, ?)", 
-                          (account_number, name, initial_deposit))
+        open_account(self.conn, account_number, name, initial_deposit)
         
         # Create user
         password_hash = self._hash_password(password)
@@ -181,16 +162,24 @@ class Bank:
         print(f"Registration successful. Your account number is {account_number}. You can now login.")
         return True
 
+    @timed
     @error_handler
     def login(self, username, password):
         """Authenticate user"""
         self.cursor.execute("SELECT username, password_hash, account_number FROM users WHERE username = ?", (username,))
         user = self.cursor.fetchone()
         
-        if not user or not self._verify_password(user[1], password):
+        ok, upgraded_hash = self._verify_password(user[1], password) if user else (False, None)
+        if not ok:
             print("Invalid username or password.")
             return False
         
+        if upgraded_hash:
+            # Transparently move legacy SHA-256 hashes to the current KDF
+            self.cursor.execute("UPDATE users SET password_hash = ? WHERE username = ? AND password_hash = ?",
+                                (upgraded_hash, user[0], user[1]))
+            self.conn.commit()
+        
         self.token = self._generate_token(user[0], user[2])
         self.current_user = {
             'username': user[0],
@@ -206,55 +195,70 @@ class Bank:
         print(f"Login successful. Welcome {account_details[0]}!")
         return True
 
+    @timed
     def logout(self):
         """Logout current user"""
+        if self.token:
+            self.tokens.revoke(self.token)
         self.current_user = None
         self.token = None
         print("Logged out successfully.")
 
+    @timed
     @authenticate
     @rate_limiter
     def deposit(self, amount):
-        amount = float(amount)
+        try:
+            amount = money.parse_amount(amount)
+        except ValueError as e:
+            print(e)
+            return
         if amount > 0:
-            self.cursor.execute("UPDATE accounts SET balance = balance + ? WHERE account_number = ?", 
-                              (amount, self.current_user['account_number']))
-            self.cursor.execute("INSERT INTO transactions (account_number, type, amount) VALUES (?, 'Deposit', ?)", 
-                              (self.current_user['account_number'], amount))
-            self.conn.commit()
-            self.current_user['balance'] += amount
-            print(f"{amount} deposited successfully. New balance: {self.current_user['balance']:.2f}")
+            try:
+                self.current_user['balance'] = self.pipeline.deposit(self.current_user['account_number'], amount).result()
+            except PostingError as e:
+                print(f"{e}.")
+                return
+            print(f"{money.format_amount(amount)} deposited successfully. New balance: {money.format_amount(self.current_user['balance'])}")
         else:
             print("Deposit amount must be positive.")
 
+    @timed
     @authenticate
     @rate_limiter
     def withdraw(self, amount):
-        amount = float(amount)
-        if amount > self.current_user['balance']:
-            print("Insufficient balance.")
-        elif amount <= 0:
+        try:
+            amount = money.parse_amount(amount)
+        except ValueError as e:
+            print(e)
+            return
+        if amount <= 0:
             print("Withdrawal amount must be positive.")
-        else:
-            self.cursor.execute("UPDATE accounts SET balance = balance - ? WHERE account_number = ?", 
-                              (amount, self.current_user['account_number']))
-            self.cursor.execute("INSERT INTO transactions (account_number, type, amount) VALUES (?, 'Withdraw', ?)", 
-                              (self.current_user['account_number'], amount))
-            self.conn.commit()
-            self.current_user['balance'] -= amount
-            print(f"{amount} withdrawn successfully. New balance: {self.current_user['balance']:.2f}")
+            return
+        try:
+            self.current_user['balance'] = self.pipeline.withdraw(self.current_user['account_number'], amount).result()
+        except InsufficientFunds:
+            print("Insufficient balance.")
+            return
+        except PostingError as e:
+            print(f"{e}.")
+            return
+        print(f"{money.format_amount(amount)} withdrawn successfully. New balance: {money.format_amount(self.current_user['balance'])}")
 
+    @timed
     @authenticate
     def get_account_balance(self):
-        print(f"Account Balance: {self.current_user['balance']:.2f}")
+        print(f"Account Balance: {money.format_amount(self.current_user['balance'])}")
 
+    @timed
     @authenticate
     def display_account_details(self):
         print("\nAccount Details:")
         print(f"Account Holder: {self.current_user['name']}")
         print(f"Account Number: {self.current_user['account_number']}")
-        print(f"Balance: {self.current_user['balance']:.2f}")
+        print(f"Balance: {money.format_amount(self.current_user['balance'])}")
 
+    @timed
     @authenticate
     @rate_limiter
     def transfer_money(self, to_account, amount):
@@ -262,61 +266,69 @@ class Bank:
             print("Cannot transfer to your own account.")
             return
         
-        # Check if target account exists
-        self.cursor.execute("SELECT name FROM accounts WHERE account_number = ?", (to_account,))
-        target_account = self.cursor.fetchone()
-        if not target_account:
-            print("Recipient account not found.")
+        try:
+            amount = money.parse_amount(amount)
+        except ValueError as e:
+            print(e)
             return
-        
-        amount = float(amount)
-        if amount > self.current_user['balance']:
-            print("Insufficient balance.")
+        if amount <= 0:
+            print("Transfer amount must be positive.")
             return
         
-        self.conn.execute("BEGIN TRANSACTION")
         try:
-            # Deduct from sender
-            self.cursor.execute("UPDATE accounts SET balance = balance - ? WHERE account_number = ?", 
-                              (amount, self.current_user['account_number']))
-            
-            # Add to recipient
-            self.cursor.execute("UPDATE accounts SET balance = balance + ? WHERE account_number = ?", 
-                              (amount, to_account))
-            
-            # Record transactions
-            self.cursor.execute("INSERT INTO transactions (account_number, type, amount, related_account) VALUES (?, 'Transfer Sent', ?, ?)", 
-                              (self.current_user['account_number'], amount, to_account))
-            self.cursor.execute("INSERT INTO transactions (account_number, type, amount, related_account) VALUES (?, 'Transfer Received', ?, ?)", 
-                              (to_account, amount, self.current_user['account_number']))
-            
-            self.conn.commit()
-            self.current_user['balance'] -= amount
-            print(f"{amount} transferred successfully to account {to_account}.")
-            print(f"New balance: {self.current_user['balance']:.2f}")
-        except:
-            self.conn.rollback()
+            self.current_user['balance'] = self.pipeline.transfer(self.current_user['account_number'],
+                                                                  to_account, amount).result()
+        except InsufficientFunds:
+            print("Insufficient balance.")
+            return
+        except PostingError as e:
+            print(f"{e}.")
+            return
+        except Exception:
             print("Transfer failed. Please try again.")
+            return
+        print(f"{money.format_amount(amount)} transferred successfully to account {to_account}.")
+        print(f"New balance: {money.format_amount(self.current_user['balance'])}")
 
+    @timed
     @authenticate
-    def get_transaction_history(self):
-        self.cursor.execute("SELECT type, amount, related_account, timestamp FROM transactions WHERE account_number = ? ORDER BY timestamp DESC LIMIT 10", 
-                          (self.current_user['account_number'],))
-        transactions = self.cursor.fetchall()
+    def get_transaction_history(self, cursor=None, limit=10):
+        """Print one page of history; returns the cursor for the next page"""
+        transactions, next_cursor = history.fetch_page(self.conn, self.current_user['account_number'],
+                                                       cursor=cursor, limit=limit)
         
         if not transactions:
             print("No transactions found.")
-            return
+            return None
         
-        print("\nLast 10 Transactions:")
+        print("\nOlder Transactions:" if cursor else f"\nLast {limit} Transactions:")
         for t in transactions:
-            if t[0] == 'Transfer Sent':
-                print(f"{t[3]}: Transferred {t[1]:.2f} to account {t[2]}")
-            elif t[0] == 'Transfer Received':
-                print(f"{t[3]}: Received {t[1]:.2f} from account {t[2]}")
+            if t[1] == 'Transfer Sent':
+                print(f"{t[4]}: Transferred {money.format_amount(t[2])} to account {t[3]}")
+            elif t[1] == 'Transfer Received':
+                print(f"{t[4]}: Received {money.format_amount(t[2])} from account {t[3]}")
             else:
-                print(f"{t[3]}: {t[0]} of {t[1]:.2f}")
+                print(f"{t[4]}: {t[1]} of {money.format_amount(t[2])}")
+        return next_cursor
+
+    @timed
+    @error_handler
+    @authenticate
+    def export_statement(self, fmt='csv', start=None, end=None, output=None):
+        """Write the full statement, or a date range, to a file"""
+        try:
+            start, end = statements.parse_date(start), statements.parse_date(end)
+            statements.check_format(fmt)
+        except statements.StatementError as e:
+            print(e)
+            return None
+        account_number = self.current_user['account_number']
+        output = output or statements.filename(account_number, fmt, start, end)
+        size = statements.export("bank.db", account_number, output, fmt, start, end)
+        print(f"Statement written to {output} ({size} bytes).")
+        return output
 
+    @timed
     @authenticate
     def delete_account(self):
         confirm = input("Are you sure you want to delete your account? This cannot be undone. (yes/no): ")
@@ -330,6 +342,10 @@ class Bank:
             self.cursor.execute("DELETE FROM transactions WHERE account_number = ?", 
                               (self.current_user['account_number'],))
             
+            # Delete balance checkpoints
+            self.cursor.execute("DELETE FROM balance_checkpoints WHERE account_number = ?", 
+                              (self.current_user['account_number'],))
+            
             # Delete user
             self.cursor.execute("DELETE FROM users WHERE account_number = ?", 
                               (self.current_user['account_number'],))
@@ -346,7 +362,11 @@ class Bank:
             print("Failed to delete account. Please try again.")
 
     def close_connection(self):
+        self.pipeline.stop()
         self.conn.close()
+        # For node_exporter's textfile collector
+        if os.environ.get('BANK_METRICS_FILE'):
+            metrics.write_textfile(os.environ['BANK_METRICS_FILE'])
 
 def main_menu(bank):
     while True:
@@ -365,7 +385,7 @@ def main_menu(bank):
                 username = input("Choose a username: ")
                 password = input("Choose a password: ")
                 name = input("Your full name: ")
-                initial_deposit = float(input("Initial deposit amount (0 if none): "))
+                initial_deposit = input("Initial deposit amount (0 if none): ")
                 bank.register(username, password, name, initial_deposit)
             elif choice == "3":
                 print("Goodbye!")
@@ -380,15 +400,16 @@ def main_menu(bank):
             print("4. Account Details")
             print("5. Transfer Money")
             print("6. Transaction History")
-            print("7. Delete Account")
-            print("8. Logout")
+            print("7. Export Statement")
+            print("8. Delete Account")
+            print("9. Logout")
             choice = input("Enter your choice: ")
             
             if choice == "1":
-                amount = float(input("Enter deposit amount: "))
+                amount = input("Enter deposit amount: ")
                 bank.deposit(amount)
             elif choice == "2":
-                amount = float(input("Enter withdrawal amount: "))
+                amount = input("Enter withdrawal amount: ")
                 bank.withdraw(amount)
             elif choice == "3":
                 bank.get_account_balance()
@@ -396,13 +417,20 @@ def main_menu(bank):
                 bank.display_account_details()
             elif choice == "5":
                 to_account = input("Enter recipient account number: ")
-                amount = float(input("Enter transfer amount: "))
+                amount = input("Enter transfer amount: ")
                 bank.transfer_money(to_account, amount)
             elif choice == "6":
-                bank.get_transaction_history()
+                cursor = bank.get_transaction_history()
+                while cursor and input("Show older transactions? (yes/no): ").lower() == 'yes':
+                    cursor = bank.get_transaction_history(cursor)
             elif choice == "7":
-                bank.delete_account()
+                fmt = input("Format (csv/ndjson/parquet) [csv]: ").strip().lower() or 'csv'
+                start = input("From date (YYYY-MM-DD, blank for all): ").strip()
+                end = input("To date (YYYY-MM-DD, blank for today): ").strip()
+                bank.export_statement(fmt, start, end)
             elif choice == "8":
+                bank.delete_account()
+            elif choice == "9":
                 bank.logout()
                 return True  # Continue running but back to login screen
             else:
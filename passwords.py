@@ -0,0 +1,177 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# KDF cost settings. scrypt memory use is 128 * n * r bytes per hash.
+COSTS = {
+    'low': {'n': 2 ** 12, 'r': 8, 'p': 1},
+    'default': {'n': 2 ** 14, 'r': 8, 'p': 1},
+    'high': {'n': 2 ** 15, 'r': 8, 'p': 1},
+}
+
+DEFAULT_COST = os.environ.get('BANK_PASSWORD_COST', 'default')
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode().rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=HASH_BYTES)
+
+
+def hash_password(password, cost=None):
+    """Salted scrypt hash: scrypt$n$r$p$salt$hash"""
+    params = COSTS[cost or DEFAULT_COST]
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = _scrypt(password, salt, params['n'], params['r'], params['p'])
+    return f"scrypt${params['n']}${params['r']}${params['p']}${_b64(salt)}${_b64(digest)}"
+
+
+def is_legacy(stored_hash):
+    """Unsalted single-round SHA-256 hashes from before scrypt"""
+    return len(stored_hash) == 64 and '$' not in stored_hash
+
+
+def needs_rehash(stored_hash, cost=None):
+    if is_legacy(stored_hash):
+        return True
+    params = COSTS[cost or DEFAULT_COST]
+    scheme, n, r, p = stored_hash.split('$')[:4]
+    return scheme != 'scrypt' or (int(n), int(r), int(p)) != (params['n'], params['r'], params['p'])
+
+
+def verify_password(stored_hash, password):
+    """Constant-time check of a password against a stored hash"""
+    if is_legacy(stored_hash):
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(candidate, stored_hash)
+    try:
+        scheme, n, r, p, salt, digest = stored_hash.split('$')
+    except ValueError:
+        return False
+    if scheme != 'scrypt':
+        return False
+    candidate = _scrypt(password, _unb64(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(candidate, _unb64(digest))
+
+
+def _verify_job(stored_hash, password, cost):
+    """Worker side of a login: verify, and rehash if the stored hash is outdated"""
+    started = time.perf_counter()
+    ok = verify_password(stored_hash, password)
+    new_hash = hash_password(password, cost) if ok and needs_rehash(stored_hash, cost) else None
+    return ok, new_hash, time.perf_counter() - started
+
+
+def _hash_job(password, cost):
+    started = time.perf_counter()
+    return hash_password(password, cost), time.perf_counter() - started
+
+
+class PasswordServiceBusy(Exception):
+    """Too many password operations are already queued"""
+
+
+class PasswordService:
+    """Runs the KDF in a bounded process pool so request threads don't stall.
+
+    At most `max_pending` operations may be queued or running at once;
+    callers beyond that wait up to `queue_timeout` seconds and then get
+    PasswordServiceBusy. With workers=0 the KDF runs inline.
+    """
+
+    def __init__(self, workers=None, max_pending=None, queue_timeout=5.0, cost=None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or max(1, self.workers) * 4
+        self.queue_timeout = queue_timeout
+        self.cost = cost or DEFAULT_COST
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._pending = 0
+        self._metrics = {
+            'hashes': 0,
+            'verifications': 0,
+            'failures': 0,
+            'upgraded': 0,
+            'busy_rejections': 0,
+            'queue_wait_seconds_total': 0.0,
+            'kdf_seconds_total': 0.0,
+            'pending_max': 0,
+        }
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._metrics['busy_rejections'] += 1
+            raise PasswordServiceBusy("Password service is busy. Please try again.")
+        try:
+            with self._lock:
+                self._pending += 1
+                self._metrics['pending_max'] = max(self._metrics['pending_max'], self._pending)
+            if self.workers:
+                result = self._executor().submit(fn, *args).result()
+            else:
+                result = fn(*args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            # Whatever wasn't spent in the KDF was spent queueing or in IPC
+            self._metrics['kdf_seconds_total'] += result[-1]
+            self._metrics['queue_wait_seconds_total'] += max(0.0, elapsed - result[-1])
+        return result
+
+    def hash(self, password):
+        new_hash, _ = self._run(_hash_job, password, self.cost)
+        with self._lock:
+            self._metrics['hashes'] += 1
+        return new_hash
+
+    def verify(self, stored_hash, password):
+        """Returns (ok, upgraded_hash); upgraded_hash is set when the stored one is outdated"""
+        ok, new_hash, _ = self._run(_verify_job, stored_hash, password, self.cost)
+        with self._lock:
+            self._metrics['verifications'] += 1
+            self._metrics['failures'] += 0 if ok else 1
+            self._metrics['upgraded'] += 1 if new_hash else 0
+        return ok, new_hash
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot['pending'] = self._pending
+        snapshot['workers'] = self.workers
+        snapshot['max_pending'] = self.max_pending
+        snapshot['cost'] = self.cost
+        return snapshot
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown()
+            self._pool = None
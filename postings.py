@@ -0,0 +1,78 @@
+class PostingError(Exception):
+    """A posting was rejected; the rest of its batch still commits"""
+
+
+class AccountNotFound(PostingError):
+    pass
+
+
+class InsufficientFunds(PostingError):
+    pass
+
+
+class PostingFailed(PostingError):
+    """The posting couldn't be written (storage error, busy database, timeout)"""
+
+
+# Transaction types that add to and subtract from a balance. 'Withdraw'
+# is what the CLI recorded before withdrawals were shared with the web app.
+CREDIT_TYPES = ('Deposit', 'Transfer Received')
+DEBIT_TYPES = ('Withdrawal', 'Withdraw', 'Transfer Sent')
+
+
+# Posting operations. Each runs inside the caller's open transaction and
+# returns the account's new balance in paise, which is also stored on the
+# transaction row as its running balance.
+def open_account(conn, account_number, name, initial_deposit):
+    # The initial deposit is a transaction like any other, so an account's
+    # balance is always the sum of its transactions
+    conn.execute("INSERT INTO accounts VALUES (?, ?, ?)", (account_number, name, initial_deposit))
+    if initial_deposit:
+        conn.execute('''INSERT INTO transactions (account_number, type, amount, running_balance)
+                        VALUES (?, 'Deposit', ?, ?)''', (account_number, initial_deposit, initial_deposit))
+    return initial_deposit
+
+
+def post_deposit(conn, account_number, amount):
+    cur = conn.execute("UPDATE accounts SET balance = balance + ? WHERE account_number = ?",
+                       (amount, account_number))
+    if cur.rowcount == 0:
+        raise AccountNotFound("Account not found")
+    new_balance = balance(conn, account_number)
+    conn.execute('''INSERT INTO transactions (account_number, type, amount, running_balance)
+                    VALUES (?, 'Deposit', ?, ?)''', (account_number, amount, new_balance))
+    return new_balance
+
+
+def post_withdrawal(conn, account_number, amount):
+    # The balance check and the debit are one statement, so two concurrent
+    # withdrawals can never both pass the check
+    debit(conn, account_number, amount)
+    new_balance = balance(conn, account_number)
+    conn.execute('''INSERT INTO transactions (account_number, type, amount, running_balance)
+                    VALUES (?, 'Withdrawal', ?, ?)''', (account_number, amount, new_balance))
+    return new_balance
+
+
+def debit(conn, account_number, amount):
+    """Conditionally debit an account, raising if it can't cover the amount"""
+    cur = conn.execute('''UPDATE accounts SET balance = balance - ?
+                          WHERE account_number = ? AND balance >= ?''',
+                       (amount, account_number, amount))
+    if cur.rowcount == 0:
+        if balance(conn, account_number) is None:
+            raise AccountNotFound("Account not found")
+        raise InsufficientFunds("Insufficient funds")
+
+
+def credit(conn, account_number, amount, missing_message="Account not found"):
+    cur = conn.execute("UPDATE accounts SET balance = balance + ? WHERE account_number = ?",
+                       (amount, account_number))
+    if cur.rowcount == 0:
+        raise AccountNotFound(missing_message)
+
+
+def balance(conn, account_number):
+    row = conn.execute("SELECT balance FROM accounts WHERE account_number = ?",
+                       (account_number,)).fetchone()
+    return row[0] if row else None
@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# A limit allows `requests` per `period` seconds for one key.
+#   token_bucket   - bursts up to `requests`, refills continuously
+#   sliding_window - sliding window counter: the current fixed window's
+#                    count plus the previous window's, weighted by how much
+#                    of it still overlaps the trailing period. Three
+#                    numbers per key whatever the limit, at the cost of
+#                    assuming the previous window's hits were evenly spread
+Limit = namedtuple('Limit', ['requests', 'period', 'algorithm'], defaults=('token_bucket',))
+
+
+def token_bucket(state, limit, now):
+    """Returns (allowed, retry_after, new_state); state is [tokens, updated_at]"""
+    tokens, updated = state if state else (float(limit.requests), now)
+    rate = limit.requests / limit.period
+    tokens = min(float(limit.requests), tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return True, 0.0, [tokens - 1, now]
+    return False, (1 - tokens) / rate, [tokens, now]
+
+
+def sliding_window(state, limit, now):
+    """Returns (allowed, retry_after, new_state); state is {window, current, previous}"""
+    period = limit.period
+    window = now - now % period
+    # Anything else is a hit log stored by an older version; start afresh
+    state = state if isinstance(state, dict) else {}
+    current, previous = state.get('current', 0), state.get('previous', 0)
+    elapsed_windows = round((window - state.get('window', window)) / period)
+    if elapsed_windows == 1:
+        current, previous = 0, current
+    elif elapsed_windows:
+        current, previous = 0, 0
+
+    into = (now - window) / period
+    room = limit.requests - 1
+    if previous * (1 - into) + current <= room:
+        return True, 0.0, {'window': window, 'current': current + 1, 'previous': previous}
+    if current <= room:
+        # The previous window's share has to decay into the room left
+        retry_after = window + period * (1 - (room - current) / previous) - now
+    else:
+        # Nothing until the next window, where this one's hits carry over
+        retry_after = window + period * (2 - room / current) - now
+    return False, retry_after, {'window': window, 'current': current, 'previous': previous}
+
+
+ALGORITHMS = {
+    'token_bucket': token_bucket,
+    'sliding_window': sliding_window,
+}
+
+
+class MemoryBackend:
+    """Per-process state, evicting keys idle for longer than `ttl`"""
+
+    def __init__(self, ttl=3600, max_keys=100000):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, key, step, now):
+        with self._lock:
+            entry = self._states.pop(key, None)
+            state = entry[1] if entry and now - entry[0] < self.ttl else None
+            allowed, retry_after, state = step(state, now)
+            # Most recently used keys live at the end
+            self._states[key] = (now, state)
+            self._evict(now)
+        return allowed, retry_after
+
+    def _evict(self, now):
+        while self._states:
+            key, (last_seen, _) = next(iter(self._states.items()))
+            if now - last_seen < self.ttl and len(self._states) <= self.max_keys:
+                break
+            del self._states[key]
+
+    def __len__(self):
+        return len(self._states)
+
+
+class SQLiteBackend:
+    """State shared by every process that opens the same file"""
+
+    def __init__(self, path, ttl=3600, sweep_every=1000):
+        self.path = path
+        self.ttl = ttl
+        self.sweep_every = sweep_every
+        self._local = threading.local()
+        self._hits = 0
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # Limiter state is disposable, so skip fsyncs
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute('''CREATE TABLE IF NOT EXISTS rate_limits (
+                            key TEXT PRIMARY KEY,
+                            state TEXT NOT NULL,
+                            updated_at REAL NOT NULL)''')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def update(self, key, step, now):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state, updated_at FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            state = json.loads(row[0]) if row and now - row[1] < self.ttl else None
+            allowed, retry_after, state = step(state, now)
+            conn.execute('''INSERT INTO rate_limits (key, state, updated_at) VALUES (?, ?, ?)
+                            ON CONFLICT(key) DO UPDATE SET state = excluded.state,
+                                                           updated_at = excluded.updated_at''',
+                         (key, json.dumps(state), now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._hits += 1
+        if self._hits % self.sweep_every == 0:
+            self.evict(now)
+        return allowed, retry_after
+
+    def evict(self, now=None):
+        """Drop keys idle for longer than the TTL"""
+        now = time.time() if now is None else now
+        conn = self._conn()
+        return conn.execute("DELETE FROM rate_limits WHERE updated_at < ?", (now - self.ttl,)).rowcount
+
+
+class RateLimiter:
+    """Per-route, per-key request limits over a pluggable backend"""
+
+    def __init__(self, backend=None, limits=None, default=None):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.limits = dict(limits or {})
+        self.default = default
+
+    def limit_for(self, route):
+        return self.limits.get(route, self.default)
+
+    def hit(self, route, key, now=None):
+        """Record one request; returns (allowed, seconds until the next is allowed)"""
+        limit = self.limit_for(route)
+        if limit is None:
+            return True, 0.0
+        algorithm = ALGORITHMS[limit.algorithm]
+        now = time.time() if now is None else now
+        return self.backend.update(f"{route}:{key}", lambda state, t: algorithm(state, limit, t), now)
+
+    def init_app(self, app, key_func, methods=('POST',)):
+        """Check limits before each request to a limited endpoint"""
+        from flask import request
+
+        @app.before_request
+        def check_rate_limit():
+            if request.method not in methods or self.limit_for(request.endpoint) is None:
+                return None
+            allowed, retry_after = self.hit(request.endpoint, key_func())
+            if not allowed:
+                return ("Too many requests. Please wait.", 429,
+                        {'Retry-After': str(max(1, int(retry_after + 0.999)))})
+            return None
+
+
+def backend_from_env(default='memory', path='ratelimit.db'):
+    """Backend named by BANK_RATE_LIMIT_BACKEND ('memory' or 'sqlite')"""
+    name = os.environ.get('BANK_RATE_LIMIT_BACKEND', default)
+    if name == 'sqlite':
+        return SQLiteBackend(os.environ.get('BANK_RATE_LIMIT_DB', path))
+    if name == 'memory':
+        return MemoryBackend()
+    raise ValueError(f"Unknown rate limit backend '{name}'")
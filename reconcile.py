@@ -0,0 +1,140 @@
+import argparse
+import json
+import time
+from array import array
+
+import money
+import storage
+from postings import CREDIT_TYPES, DEBIT_TYPES
+
+try:
+    import numpy
+except ImportError:  # optional, only makes accumulation faster
+    numpy = None
+
+# Ledger reconciliation: every account's balance must equal the signed sum
+# of its transactions. Accounts open at zero and the initial deposit is a
+# transaction (migration 10 posted those of older accounts), so nothing is
+# taken from the balances being checked, running balances included. The
+# transactions table is streamed in chunks and summed into one int64 slot
+# per account, so memory grows with the number of accounts, not
+# transactions. Everything is read from one snapshot while writers carry on.
+CHUNK_SIZE = 50000
+
+
+def _quoted(types):
+    return ", ".join(f"'{t}'" for t in types)
+
+
+# Signed amount of a transactions row, NULL for a type we don't know
+SIGNED_OR_NULL = (f"CASE WHEN type IN ({_quoted(CREDIT_TYPES)}) THEN amount "
+                  f"WHEN type IN ({_quoted(DEBIT_TYPES)}) THEN -amount END")
+
+
+def _load_accounts(conn, chunk_size):
+    index = {}
+    balances = array('q')
+    cursor = conn.execute("SELECT account_number, balance FROM accounts")
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for account_number, balance in rows:
+            index[account_number] = len(balances)
+            balances.append(balance)
+    return index, balances
+
+
+def reconcile(conn, chunk_size=CHUNK_SIZE, use_numpy=None):
+    """Compare every balance with its ledger; returns a report dict"""
+    use_numpy = numpy is not None if use_numpy is None else use_numpy
+    started = time.perf_counter()
+    orphans = {}
+    unknown_types = 0
+    rows_read = 0
+
+    conn.execute("BEGIN")
+    try:
+        index, balances = _load_accounts(conn, chunk_size)
+        if use_numpy:
+            totals = numpy.zeros(len(balances), dtype=numpy.int64)
+        else:
+            totals = array('q', bytes(8 * len(balances)))
+
+        cursor = conn.execute(f"SELECT account_number, {SIGNED_OR_NULL} FROM transactions")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            rows_read += len(rows)
+            codes = []
+            amounts = []
+            for account_number, signed in rows:
+                if signed is None:
+                    unknown_types += 1
+                    continue
+                code = index.get(account_number)
+                if code is None:
+                    orphans[account_number] = orphans.get(account_number, 0) + 1
+                    continue
+                codes.append(code)
+                amounts.append(signed)
+            if use_numpy:
+                numpy.add.at(totals, numpy.array(codes, dtype=numpy.intp),
+                             numpy.array(amounts, dtype=numpy.int64))
+            else:
+                for code, signed in zip(codes, amounts):
+                    totals[code] += signed
+    finally:
+        conn.execute("COMMIT")
+
+    accounts = list(index)
+    discrepancies = []
+    for code, account_number in enumerate(accounts):
+        expected = int(totals[code])
+        if expected != balances[code]:
+            discrepancies.append({
+                'account_number': account_number,
+                'balance': money.format_amount(balances[code]),
+                'expected': money.format_amount(expected),
+                'difference': money.format_amount(balances[code] - expected),
+            })
+
+    seconds = time.perf_counter() - started
+    return {
+        'accounts': len(accounts),
+        'transactions': rows_read,
+        'discrepancies': discrepancies,
+        'orphan_transactions': orphans,
+        'unknown_type_rows': unknown_types,
+        'engine': 'numpy' if use_numpy else 'array',
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(rows_read / seconds) if seconds else 0,
+        'ok': not discrepancies and not orphans and not unknown_types,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check every balance against its transactions")
+    parser.add_argument('database', nargs='?', default='bank.db')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--no-numpy', action='store_true', help="accumulate with the array module")
+    parser.add_argument('--output', help="write the full report as JSON")
+    args = parser.parse_args()
+
+    conn = storage.connect(args.database, isolation_level=None)
+    try:
+        report = reconcile(conn, args.chunk_size, use_numpy=False if args.no_numpy else None)
+    finally:
+        conn.close()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"Reconciled {report['accounts']} accounts and {report['transactions']} transactions "
+          f"in {report['seconds']}s ({report['rows_per_sec']} rows/s, {report['engine']})")
+    print(f"{len(report['discrepancies'])} discrepancies, {sum(report['orphan_transactions'].values())} "
+          f"orphan transactions, {report['unknown_type_rows']} rows of unknown type")
+    for item in report['discrepancies'][:20]:
+        print(f"  {item['account_number']}: balance {item['balance']}, ledger {item['expected']} "
+              f"(off by {item['difference']})")
+    raise SystemExit(0 if report['ok'] else 1)
@@ -0,0 +1,82 @@
+import hashlib
+
+# Table definitions shared by app.py and online-banking-system.py.
+# Money columns hold integer paise (see money.py).
+TABLES = {
+    'accounts': '''CREATE TABLE IF NOT EXISTS {name} (
+                    account_number TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    balance INTEGER NOT NULL DEFAULT 0)''',
+    'users': '''CREATE TABLE IF NOT EXISTS {name} (
+                    username TEXT PRIMARY KEY,
+                    account_number TEXT UNIQUE,
+                    password_hash TEXT NOT NULL,
+                    FOREIGN KEY(account_number) REFERENCES accounts(account_number))''',
+    'transactions': '''CREATE TABLE IF NOT EXISTS {name} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    account_number TEXT,
+                    type TEXT,
+                    amount INTEGER NOT NULL,
+                    related_account TEXT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY(account_number) REFERENCES accounts(account_number))''',
+}
+
+# Secondary indexes. Transaction history is always read per account,
+# newest first, so the index covers the filter and the sort and lets
+# pages seek by (timestamp, id).
+INDEXES = [
+    '''CREATE INDEX IF NOT EXISTS idx_transactions_account_time
+       ON transactions (account_number, timestamp, id)''',
+]
+
+# Columns that older bank.db files stored as REAL rupees
+MONEY_COLUMNS = {
+    'accounts': ('balance', 'account_number, name, CAST(ROUND(COALESCE(balance, 0) * 100) AS INTEGER)'),
+    'transactions': ('amount', 'id, account_number, type, CAST(ROUND(COALESCE(amount, 0) * 100) AS INTEGER), '
+                               'related_account, timestamp'),
+}
+
+
+def create_tables(conn):
+    """Create any missing tables"""
+    for name, statement in TABLES.items():
+        conn.execute(statement.format(name=name))
+
+
+def create_indexes(conn):
+    """Create any missing secondary indexes"""
+    for statement in INDEXES:
+        conn.execute(statement)
+
+
+def seed_test_account(conn):
+    """Add the sample test account if there are no users yet"""
+    if conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+        conn.execute("INSERT INTO accounts VALUES ('1234567890', 'Test User', 1000000)")
+        conn.execute("INSERT INTO users VALUES ('test', '1234567890', ?)",
+                     (hashlib.sha256('test123'.encode()).hexdigest(),))
+
+
+def _column_type(conn, table, column):
+    for row in conn.execute(f"PRAGMA table_info({table})"):
+        if row[1] == column:
+            return row[2].upper()
+    return None
+
+
+def migrate_money_to_paise(conn):
+    """Rebuild REAL rupee columns from older bank.db files as INTEGER paise.
+
+    SQLite can't change a column type in place, so each affected table is
+    copied into a new table and swapped in. Returns the tables converted.
+    """
+    pending = [table for table, (column, _) in MONEY_COLUMNS.items()
+               if _column_type(conn, table, column) == 'REAL']
+    for table in pending:
+        _, select = MONEY_COLUMNS[table]
+        conn.execute(TABLES[table].format(name=f"{table}_paise"))
+        conn.execute(f"INSERT INTO {table}_paise SELECT {select} FROM {table}")
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_paise RENAME TO {table}")
+    return pending
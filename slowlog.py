@@ -0,0 +1,193 @@
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+
+# Slow-query log. InstrumentedCursor (metrics.py) hands every statement
+# slower than the threshold to SlowQueryLog.record(), which writes one
+# JSON line with the normalized SQL and the shape of its parameters (never
+# their values, which include password hashes and balances). The first
+# time a statement is slow its EXPLAIN QUERY PLAN is captured and kept,
+# and every later line says whether that plan scans a table.
+THRESHOLD = 0.1
+MAX_BYTES = 10 * 1024 * 1024
+BACKUPS = 5
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+_PLANNED = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+@lru_cache(maxsize=4096)
+def normalize(sql):
+    """SQL with literals replaced by ? and whitespace collapsed"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+
+def _type(value):
+    return 'null' if value is None else type(value).__name__
+
+
+def param_shape(parameters):
+    """Types of the bound parameters: ['str', 'int'] or {'name': 'str'}"""
+    if isinstance(parameters, dict):
+        return {name: _type(value) for name, value in parameters.items()}
+    try:
+        return [_type(value) for value in parameters]
+    except TypeError:
+        return None
+
+
+def _is_scan(detail):
+    # "SCAN transactions" (or "SCAN TABLE ..." before SQLite 3.36) reads
+    # every row; a constant row is not a table
+    return detail.startswith('SCAN') and 'CONSTANT ROW' not in detail
+
+
+class SlowQueryLog:
+    """Writes statements slower than `threshold` seconds to a rotating JSONL file.
+
+    `context` is an optional callable whose result is stored with each
+    line, e.g. the Flask endpoint that ran the query.
+    """
+
+    def __init__(self, path='slow_queries.jsonl', threshold=THRESHOLD, max_bytes=MAX_BYTES,
+                 backups=BACKUPS, explain=True, context=None):
+        self.path = path
+        self.threshold = threshold
+        self.explain = explain
+        self.context = context
+        # The handler serializes writes and rotates; the file is created lazily
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, delay=True)
+        self._handler.setFormatter(logging.Formatter('%(message)s'))
+        self._lock = threading.Lock()
+        self._plans = {}
+        self._stats = {}
+
+    def _plan(self, cursor, sql, normalized, parameters):
+        """(plan lines, full scan, first time seen) for a statement"""
+        known = self._plans.get(normalized)
+        if known is not None:
+            return known[0], known[1], False
+        plan = None
+        if self.explain and parameters is not None and sql.lstrip()[:7].upper().startswith(_PLANNED):
+            try:
+                # A plain cursor, so the EXPLAIN itself isn't timed or logged
+                rows = cursor.connection.cursor(sqlite3.Cursor).execute(
+                    "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+                plan = [row[-1] for row in rows]
+            except sqlite3.Error:
+                plan = None
+        full_scan = any(_is_scan(detail) for detail in plan) if plan else False
+        with self._lock:
+            if normalized in self._plans:
+                return self._plans[normalized][0], self._plans[normalized][1], False
+            self._plans[normalized] = (plan, full_scan)
+        return plan, full_scan, True
+
+    def record(self, cursor, sql, parameters, seconds, many=False):
+        """Log one slow statement; `parameters` is the first row for executemany"""
+        normalized = normalize(sql)
+        plan, full_scan, first = self._plan(cursor, sql, normalized, parameters)
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seconds': round(seconds, 6),
+            'fingerprint': fingerprint(normalized),
+            'sql': normalized,
+            'params': param_shape(parameters) if parameters is not None else None,
+            'many': many,
+            'rowcount': cursor.rowcount,
+            'full_scan': full_scan,
+        }
+        if self.context is not None:
+            try:
+                entry['context'] = self.context()
+            except Exception:
+                entry['context'] = None
+        if first:
+            entry['plan'] = plan
+        with self._lock:
+            _add(self._stats, normalized, seconds, full_scan)
+        self._handler.emit(logging.makeLogRecord({'msg': json.dumps(entry)}))
+
+    def top(self, n=10):
+        """The n statements with the most total slow time in this process"""
+        with self._lock:
+            return _ranked(self._stats, n)
+
+    def close(self):
+        self._handler.close()
+
+
+def _add(stats, normalized, seconds, full_scan):
+    item = stats.get(normalized)
+    if item is None:
+        item = stats[normalized] = {'count': 0, 'total': 0.0, 'max': 0.0, 'full_scan': False}
+    item['count'] += 1
+    item['total'] += seconds
+    item['max'] = max(item['max'], seconds)
+    item['full_scan'] = item['full_scan'] or full_scan
+
+
+def _ranked(stats, n):
+    ranked = sorted(stats.items(), key=lambda pair: pair[1]['total'], reverse=True)[:n]
+    return [{'sql': sql, 'count': item['count'], 'total_seconds': round(item['total'], 6),
+             'mean_seconds': round(item['total'] / item['count'], 6), 'max_seconds': round(item['max'], 6),
+             'full_scan': item['full_scan']} for sql, item in ranked]
+
+
+def report(path='slow_queries.jsonl', n=20):
+    """Aggregate a log and its rotated files into the top n statements"""
+    stats = {}
+    plans = {}
+    for name in sorted(glob.glob(glob.escape(path) + '*')):
+        with open(name) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                _add(stats, entry['sql'], entry['seconds'], entry.get('full_scan', False))
+                if entry.get('plan'):
+                    plans[entry['sql']] = entry['plan']
+    top = _ranked(stats, n)
+    for item in top:
+        item['plan'] = plans.get(item['sql'])
+    return top
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the slow-query log")
+    parser.add_argument('path', nargs='?', default='slow_queries.jsonl')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    top = report(args.path, args.top)
+    if args.json:
+        print(json.dumps(top, indent=2))
+    elif not top:
+        print("No slow queries logged.")
+    for rank, item in enumerate(top if not args.json else [], 1):
+        flag = '  FULL SCAN' if item['full_scan'] else ''
+        print(f"{rank}. {item['count']}x, {item['total_seconds']:.3f}s total, "
+              f"{item['mean_seconds'] * 1000:.1f}ms mean, {item['max_seconds'] * 1000:.1f}ms max{flag}")
+        print(f"   {item['sql']}")
+        for detail in item['plan'] or []:
+            print(f"     {detail}")
@@ -0,0 +1,206 @@
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import date, timedelta
+
+import money
+import storage
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional, only needed for Parquet statements
+    pyarrow = None
+
+# Account statements are streamed: rows come off the cursor in fetchmany
+# batches and each batch is encoded and handed on before the next is read,
+# so memory stays flat however many years a statement covers.
+COLUMNS = ('id', 'timestamp', 'type', 'amount', 'related_account')
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+BATCH_SIZE = 5000
+
+
+class StatementError(ValueError):
+    pass
+
+
+def _rupees(paise):
+    # Same text as str(money.to_rupees()), without building a Decimal per row
+    rupees, remainder = divmod(abs(paise), money.PAISE_PER_RUPEE)
+    return f"{'-' if paise < 0 else ''}{rupees}.{remainder:02d}"
+
+
+def parse_date(value):
+    """A 'YYYY-MM-DD' date, or None for an empty value"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise StatementError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise StatementError(f"Unknown format '{fmt}', expected one of {', '.join(FORMATS)}")
+    if fmt == 'parquet' and pyarrow is None:
+        raise StatementError("Parquet statements need the 'pyarrow' package")
+
+
+def iter_batches(conn, account_number, start=None, end=None, batch_size=BATCH_SIZE):
+    """Batches of an account's transactions, oldest first, between two dates inclusive"""
+    clauses = ["account_number = ?"]
+    params = [account_number]
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(start.isoformat())
+    if end:
+        clauses.append("timestamp < ?")
+        params.append((end + timedelta(days=1)).isoformat())
+    cursor = conn.execute(f'''SELECT id, timestamp, type, amount, related_account FROM transactions
+                              WHERE {' AND '.join(clauses)}
+                              ORDER BY timestamp, id''', params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in batches:
+        writer.writerows((row[0], row[1], row[2], _rupees(row[3]), row[4]) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(batches):
+    for rows in batches:
+        yield ''.join(json.dumps({'id': row[0], 'timestamp': row[1], 'type': row[2],
+                                  'amount': _rupees(row[3]),
+                                  'related_account': row[4]}) + '\n' for row in rows)
+
+
+class _ChunkSink:
+    """Write-only file that hands out what was written since the last take()"""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_chunks(batches):
+    # One row group per batch; amounts stay exact as decimal(18, 2)
+    schema = pyarrow.schema([('id', pyarrow.int64()), ('timestamp', pyarrow.string()),
+                             ('type', pyarrow.string()), ('amount', pyarrow.decimal128(18, 2)),
+                             ('related_account', pyarrow.string())])
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    try:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_table(pyarrow.table([columns[0], columns[1], columns[2],
+                                              [money.to_rupees(paise) for paise in columns[3]],
+                                              columns[4]], schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+ENCODERS = {
+    'csv': _csv_chunks,
+    'ndjson': _ndjson_chunks,
+    'parquet': _parquet_chunks,
+}
+
+
+def stream_statement(database, account_number, fmt='csv', start=None, end=None, batch_size=BATCH_SIZE):
+    """Generator of encoded statement chunks (str, or bytes for Parquet).
+
+    Reads from its own connection, closed when the generator finishes or
+    is closed, so a slow download never holds a pooled connection.
+    """
+    check_format(fmt)
+    conn = storage.connect(database)
+    try:
+        yield from ENCODERS[fmt](iter_batches(conn, account_number, start, end, batch_size))
+    finally:
+        conn.close()
+
+
+def filename(account_number, fmt, start=None, end=None):
+    period = f"_{start or 'start'}_{end or 'today'}" if start or end else ''
+    return f"statement_{account_number}{period}.{FORMATS[fmt][1]}"
+
+
+def export(database, account_number, output, fmt='csv', start=None, end=None):
+    """Write a statement to a path ('-' for stdout); returns bytes written"""
+    written = 0
+    out = sys.stdout.buffer if output == '-' else open(output, 'wb')
+    try:
+        for chunk in stream_statement(database, account_number, fmt, start, end):
+            data = chunk.encode() if isinstance(chunk, str) else chunk
+            out.write(data)
+            written += len(data)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export an account statement")
+    parser.add_argument('account_number')
+    parser.add_argument('--database', default='bank.db')
+    parser.add_argument('--format', choices=list(FORMATS), default='csv')
+    parser.add_argument('--from', dest='start', help="first day, YYYY-MM-DD")
+    parser.add_argument('--to', dest='end', help="last day, YYYY-MM-DD")
+    parser.add_argument('--output', help="file to write, '-' for stdout")
+    args = parser.parse_args()
+
+    try:
+        start, end = parse_date(args.start), parse_date(args.end)
+        check_format(args.format)
+    except StatementError as e:
+        parser.error(str(e))
+    output = args.output or filename(args.account_number, args.format, start, end)
+    size = export(args.database, args.account_number, output, args.format, start, end)
+    if output != '-':
+        print(f"Statement written to {output} ({size} bytes)", file=sys.stderr)
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+
+# PRAGMA profiles for bank.db. journal_mode is persistent in the file;
+# everything else is per connection and applied on every connect.
+PROFILES = {
+    # fsync on every commit, survives power loss
+    'durable': {
+        'synchronous': 'FULL',
+        'cache_size': -16000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 10000,
+        'wal_autocheckpoint': 1000,
+    },
+    # WAL + NORMAL is safe against application crashes; a power cut can
+    # lose the last few commits but never corrupts the database
+    'balanced': {
+        'synchronous': 'NORMAL',
+        'cache_size': -32000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'wal_autocheckpoint': 1000,
+    },
+    # No fsync at all, for bulk loads and benchmarks
+    'throughput': {
+        'synchronous': 'OFF',
+        'cache_size': -128000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'wal_autocheckpoint': 4000,
+    },
+}
+
+DEFAULT_PROFILE = os.environ.get('BANK_DB_PROFILE', 'balanced')
+
+
+def get_profile(name=None):
+    """Look up a storage profile by name"""
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown storage profile '{name}'. Choose from: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def configure_connection(conn, profile=None):
+    """Apply the per-connection PRAGMAs of a profile"""
+    settings = get_profile(profile)
+    conn.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = {int(settings['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(settings['mmap_size'])}")
+    conn.execute(f"PRAGMA temp_store = {settings['temp_store']}")
+    conn.execute(f"PRAGMA busy_timeout = {int(settings['busy_timeout'])}")
+    conn.execute(f"PRAGMA wal_autocheckpoint = {int(settings['wal_autocheckpoint'])}")
+    return conn
+
+
+def enable_wal(conn):
+    """Switch the database file to WAL so readers don't block on writers"""
+    mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    # In-memory databases can't use WAL and report 'memory' instead
+    return mode
+
+
+def connect(database, profile=None, **kwargs):
+    """Open a connection with the storage profile applied"""
+    conn = sqlite3.connect(database, **kwargs)
+    configure_connection(conn, profile)
+    return conn
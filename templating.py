@@ -0,0 +1,24 @@
+import os
+
+from jinja2 import FileSystemBytecodeCache
+
+
+def configure_templates(app, cache_dir=None):
+    """Cache compiled template bytecode on disk.
+
+    Must run before the app's Jinja environment is first used. Cache files
+    are written atomically, so concurrently booting workers can share the
+    directory.
+    """
+    cache_dir = cache_dir or os.path.join(app.root_path, '.jinja_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(cache_dir))
+    return cache_dir
+
+
+def precompile_templates(app):
+    """Load every template once so the bytecode cache is warm; returns the count"""
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
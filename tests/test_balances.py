@@ -0,0 +1,33 @@
+import os
+import sys
+import unittest
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import balances  # noqa: E402
+
+
+class AsOfBoundTest(unittest.TestCase):
+    def test_bare_date_means_end_of_day(self):
+        self.assertEqual(balances.as_of_bound('2024-03-31'), '2024-03-31 23:59:59')
+        self.assertEqual(balances.as_of_bound(date(2024, 3, 31)), '2024-03-31 23:59:59')
+
+    def test_seconds_are_optional(self):
+        self.assertEqual(balances.as_of_bound('2024-03-31 08:15'), '2024-03-31 08:15:00')
+        self.assertEqual(balances.as_of_bound('2024-03-31 08:15:30'), '2024-03-31 08:15:30')
+
+    def test_aware_datetimes_are_converted_to_utc(self):
+        ist = timezone(timedelta(hours=5, minutes=30))
+        self.assertEqual(balances.as_of_bound(datetime(2024, 4, 1, 1, 0, tzinfo=ist)), '2024-03-31 19:30:00')
+
+    def test_other_formats_are_rejected(self):
+        for text in ('20240331', '2024-W13-7', '2024-3-31', '31/03/2024', '2024-03-31 25:00', '',
+                     '2024-03-31T08:15:00', '2024-03-31 08:15:00.5', '2024-03-31 08:15:00Z',
+                     '2024-03-31 05:30:00+05:30', '2024-03-31 05:30:00-04:00'):
+            with self.assertRaises(ValueError):
+                balances.as_of_bound(text)
+
+
+if __name__ == '__main__':
+    unittest.main()
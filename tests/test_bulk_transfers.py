@@ -0,0 +1,41 @@
+import os
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+import money  # noqa: E402
+from bulk_transfers import BulkTransferEngine, BulkTransferError  # noqa: E402
+
+
+class ApplyTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        migrations.migrate(self.conn)
+        self.conn.executemany("INSERT INTO accounts (account_number, name, balance) VALUES (?, ?, ?)",
+                              [('1000', 'Payer', 50000), ('2000', 'Alice', 0), ('3000', 'Bob', 0)])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def balances(self):
+        return dict(self.conn.execute("SELECT account_number, balance FROM accounts "
+                                      "WHERE account_number IN ('1000', '2000', '3000')"))
+
+    def test_valid_lines_are_posted_and_invalid_ones_rejected(self):
+        report = BulkTransferEngine().apply(self.conn, '1000', [('2000', '100'), ('3000', '50.50'),
+                                                                ('9999', '1'), ('1000', '1')])
+        self.assertEqual((report['accepted'], report['rejected'], report['total']), (2, 2, 15050))
+        self.assertEqual(self.balances(), {'1000': 34950, '2000': 10000, '3000': 5050})
+
+    def test_total_above_max_amount_is_rejected_before_posting(self):
+        most = money.format_amount(money.MAX_AMOUNT).replace(',', '')
+        with self.assertRaises(BulkTransferError):
+            BulkTransferEngine().apply(self.conn, '1000', [('2000', most)] * 2)
+        self.assertEqual(self.balances(), {'1000': 50000, '2000': 0, '3000': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
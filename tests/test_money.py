@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import money  # noqa: E402
+
+
+class ParseAmountTest(unittest.TestCase):
+    def test_maximum_is_accepted(self):
+        self.assertEqual(money.parse_amount(money.to_rupees(money.MAX_AMOUNT)), money.MAX_AMOUNT)
+
+    def test_one_paisa_over_maximum_is_rejected(self):
+        with self.assertRaises(ValueError):
+            money.parse_amount(money.to_rupees(money.MAX_AMOUNT + 1))
+
+    def test_huge_amounts_are_rejected(self):
+        for value in ('1e30', '92233720368547758.07', 10 ** 20, 1e300):
+            with self.assertRaises(ValueError):
+                money.parse_amount(value)
+
+    def test_maximum_fits_sqlite_integers(self):
+        # Thousands of maximal deposits still fit a signed 64-bit balance
+        self.assertLess(money.MAX_AMOUNT * 1000, 2 ** 63)
+
+
+
+class AggregateTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute("CREATE TABLE accounts (account_number TEXT PRIMARY KEY, name TEXT, balance INTEGER)")
+        self.conn.execute("CREATE TABLE transactions (id INTEGER PRIMARY KEY, account_number TEXT, type TEXT, "
+                          "amount INTEGER)")
+        self.conn.executemany("INSERT INTO accounts VALUES (?, ?, ?)",
+                              [('A', 'a', money.MAX_AMOUNT), ('B', 'b', 1), ('C', 'c', 0)])
+        self.conn.executemany("INSERT INTO transactions (account_number, type, amount) VALUES (?, ?, ?)",
+                              [('A', 'Deposit', 10), ('A', 'Deposit', 20), ('A', 'Withdrawal', 5),
+                               ('B', 'Deposit', 1)] + [('B', 'Deposit', 1)] * 9)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_totals_by_type(self):
+        self.assertEqual(money.totals_by_type(self.conn), {'Deposit': 40, 'Withdrawal': 5})
+
+    def test_totals_by_type_for_one_account(self):
+        self.assertEqual(money.totals_by_type(self.conn, 'A'), {'Deposit': 30, 'Withdrawal': 5})
+        self.assertEqual(money.totals_by_type(self.conn, 'missing'), {})
+
+    def test_sums_are_exact_integers(self):
+        # Paise are summed as integers, never through floats
+        self.assertEqual(money.totals_by_type(self.conn, 'B'), {'Deposit': 10})
+        self.assertIsInstance(money.totals_by_type(self.conn, 'B')['Deposit'], int)
+
+    def test_total_balances(self):
+        self.assertEqual(money.total_balances(self.conn), money.MAX_AMOUNT + 1)
+
+    def test_total_balances_of_no_accounts_is_zero(self):
+        self.conn.execute("DELETE FROM accounts")
+        self.assertEqual(money.total_balances(self.conn), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
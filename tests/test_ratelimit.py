@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ratelimit import Limit, MemoryBackend, RateLimiter, SQLiteBackend, sliding_window  # noqa: E402
+
+
+class SlidingWindowTest(unittest.TestCase):
+    limit = Limit(10, 60, 'sliding_window')
+
+    def hits(self, state, times):
+        results = []
+        for now in times:
+            allowed, retry_after, state = sliding_window(state, self.limit, now)
+            results.append((allowed, retry_after))
+        return results, state
+
+    def test_limit_within_one_window(self):
+        results, state = self.hits(None, [600 + i for i in range(11)])
+        self.assertEqual([allowed for allowed, _ in results], [True] * 10 + [False])
+        # All ten hits carry into the next window at full weight, so the
+        # next is allowed once it has decayed to nine: 6 s into it
+        self.assertAlmostEqual(results[-1][1], 666 - 610)
+        self.assertEqual(state, {'window': 600, 'current': 10, 'previous': 0})
+
+    def test_previous_window_is_weighted_by_overlap(self):
+        _, state = self.hits(None, [600 + i for i in range(10)])
+        # A quarter into the next window, 7.5 of the 10 still count, so
+        # two more fit and the third waits until they've decayed to 7
+        results, state = self.hits(state, [675, 675, 675, 675])
+        self.assertEqual([allowed for allowed, _ in results], [True, True, False, False])
+        self.assertAlmostEqual(results[-1][1], 60 * (1 - 7 / 10) - 15)
+        self.assertEqual(state, {'window': 660, 'current': 2, 'previous': 10})
+
+    def test_state_stays_the_same_size(self):
+        _, state = self.hits(None, [i * 0.5 for i in range(1000)])
+        self.assertEqual(set(state), {'window', 'current', 'previous'})
+
+    def test_idle_windows_reset_the_counts(self):
+        _, state = self.hits(None, [600 + i for i in range(10)])
+        results, state = self.hits(state, [800])
+        self.assertTrue(results[0][0])
+        self.assertEqual(state, {'window': 780, 'current': 1, 'previous': 0})
+
+    def test_old_hit_logs_are_discarded(self):
+        allowed, _, state = sliding_window([1.0, 2.0, 3.0], self.limit, 610)
+        self.assertTrue(allowed)
+        self.assertEqual(state, {'window': 600, 'current': 1, 'previous': 0})
+
+
+class BackendTest(unittest.TestCase):
+    def check(self, backend):
+        limiter = RateLimiter(backend, limits={'login': Limit(3, 60, 'sliding_window')})
+        results = [limiter.hit('login', 'alice', now=600 + i)[0] for i in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+        self.assertTrue(limiter.hit('login', 'bob', now=604)[0])
+
+    def test_memory_backend(self):
+        self.check(MemoryBackend())
+
+    def test_sqlite_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.check(SQLiteBackend(os.path.join(directory, 'ratelimit.db')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transfers import RetriesExhausted, TransferEngine  # noqa: E402
+
+
+class BeginTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, 'bank.db')
+        self.holder = sqlite3.connect(self.database, isolation_level=None, check_same_thread=False)
+        self.holder.execute("PRAGMA journal_mode = WAL")
+        self.conn = sqlite3.connect(self.database, isolation_level=None, check_same_thread=False)
+
+    def tearDown(self):
+        self.conn.close()
+        self.holder.close()
+        self.directory.cleanup()
+
+    def test_held_lock_is_counted_as_conflicts(self):
+        engine = TransferEngine(max_wait=0.2)
+        engine.configure(self.conn)
+        self.holder.execute("BEGIN IMMEDIATE")
+        with self.assertRaises(RetriesExhausted):
+            engine.begin(self.conn)
+        stats = engine.stats()
+        self.assertGreater(stats['conflicts'], 0)
+        self.assertEqual(stats['retries_exhausted'], 1)
+        self.assertGreater(stats['lock_wait_seconds_total'], 0.2)
+
+    def test_retries_until_the_lock_is_released(self):
+        engine = TransferEngine()
+        engine.configure(self.conn)
+        self.holder.execute("BEGIN IMMEDIATE")
+        release = threading.Timer(0.1, lambda: self.holder.execute("COMMIT"))
+        release.start()
+        engine.begin(self.conn)
+        self.conn.execute("COMMIT")
+        release.join()
+        self.assertGreater(engine.stats()['retries'], 0)
+        self.assertEqual(engine.stats()['retries_exhausted'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import math
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+import storage
+
+# Verified tokens are cached by digest until their exp claim, so checking
+# a token that was seen recently costs a dict lookup instead of an HMAC and
+# claim validation. Revoked token ids (jti) are stored in revoked_tokens
+# and mirrored into an in-memory Bloom filter; only a filter hit, which is
+# rare for live tokens, needs the table to confirm.
+
+
+class TokenRevoked(jwt.InvalidTokenError):
+    pass
+
+
+class BloomFilter:
+    """Set membership with no false negatives and a bounded false positive rate"""
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def create_revocation_table(conn):
+    """Create the table of revoked token ids"""
+    # AUTOINCREMENT so ids are never reused after a purge; processes pick
+    # up new revocations by id
+    conn.execute('''CREATE TABLE IF NOT EXISTS revoked_tokens (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    jti TEXT NOT NULL UNIQUE,
+                    expires_at INTEGER NOT NULL)''')
+
+
+class TokenService:
+    """Issues and verifies HS256 JWTs with a verified-token cache and revocation.
+
+    Revocations made by other processes are picked up every
+    `refresh_interval` seconds with one query for new revoked_tokens rows.
+    Every `purge_interval` seconds (and on first use) expired revocations
+    are purged and the filter is rebuilt, so neither grows forever.
+    """
+
+    def __init__(self, secret, database, algorithm='HS256', cache_size=4096,
+                 capacity=100000, error_rate=0.001, refresh_interval=5.0, purge_interval=3600.0):
+        self.secret = secret
+        self.database = database
+        self.algorithm = algorithm
+        self.cache_size = cache_size
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.purge_interval = purge_interval
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._revoked = BloomFilter(capacity, error_rate)
+        self._last_id = 0
+        self._refreshed_at = 0.0
+        self._purged_at = 0.0
+        self._metrics = {
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'decodes': 0,
+            'revoked_rejections': 0,
+            'filter_lookups': 0,
+            'false_positives': 0,
+        }
+
+    def issue(self, claims, minutes=30):
+        """Signed token for `claims`, with a unique jti and an exp `minutes` from now"""
+        payload = dict(claims)
+        payload['jti'] = secrets.token_hex(16)
+        payload['exp'] = datetime.now(timezone.utc) + timedelta(minutes=minutes)
+        return jwt.encode(payload, self.secret, algorithm=self.algorithm)
+
+    def verify(self, token):
+        """Decoded claims of a valid, unrevoked token.
+
+        Raises jwt.ExpiredSignatureError, TokenRevoked or another
+        jwt.InvalidTokenError.
+        """
+        key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        self._refresh(now)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self._metrics['cache_hits'] += 1
+            else:
+                self._metrics['cache_misses'] += 1
+        if entry is not None:
+            payload, expires_at = entry
+            if now >= expires_at:
+                with self._lock:
+                    self._cache.pop(key, None)
+                raise jwt.ExpiredSignatureError("Signature has expired")
+        else:
+            payload = jwt.decode(token, self.secret, algorithms=[self.algorithm],
+                                 options={'require': ['exp']})
+            with self._lock:
+                self._metrics['decodes'] += 1
+                self._cache[key] = (payload, payload['exp'])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        if self._is_revoked(payload.get('jti')):
+            with self._lock:
+                self._cache.pop(key, None)
+                self._metrics['revoked_rejections'] += 1
+            raise TokenRevoked("Token has been revoked")
+        return payload
+
+    def revoke(self, token):
+        """Revoke a token until its expiry; returns False if it was already invalid"""
+        try:
+            payload = self.verify(token)
+        except jwt.InvalidTokenError:
+            return False
+        jti = payload.get('jti')
+        if jti is None:
+            return False
+        conn = storage.connect(self.database)
+        try:
+            conn.execute("INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                         (jti, int(payload['exp'])))
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            self._revoked.add(jti)
+            self._cache.pop(hashlib.sha256(token.encode()).digest(), None)
+        return True
+
+    def _is_revoked(self, jti):
+        if jti is None:
+            return False
+        with self._lock:
+            self._metrics['filter_lookups'] += 1
+            if jti not in self._revoked:
+                return False
+        conn = storage.connect(self.database)
+        try:
+            revoked = conn.execute("SELECT 1 FROM revoked_tokens WHERE jti = ?", (jti,)).fetchone() is not None
+        finally:
+            conn.close()
+        if not revoked:
+            with self._lock:
+                self._metrics['false_positives'] += 1
+        return revoked
+
+    def _refresh(self, now):
+        """Add revocations recorded since the last refresh to the filter"""
+        if self.purge_interval is not None and now - self._purged_at >= self.purge_interval:
+            with self._lock:
+                due = now - self._purged_at >= self.purge_interval
+                self._purged_at = now
+            if due:
+                # Also reloads the filter from the table
+                self.purge(now)
+                return
+        if now - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            if now - self._refreshed_at < self.refresh_interval:
+                return
+            self._refreshed_at = now
+            last_id = self._last_id
+        conn = storage.connect(self.database)
+        try:
+            rows = conn.execute("SELECT id, jti FROM revoked_tokens WHERE id > ? ORDER BY id",
+                                (last_id,)).fetchall()
+        finally:
+            conn.close()
+        with self._lock:
+            for row_id, jti in rows:
+                self._revoked.add(jti)
+                self._last_id = max(self._last_id, row_id)
+
+    def purge(self, now=None):
+        """Drop expired revocations and rebuild the filter without them"""
+        now = int(time.time() if now is None else now)
+        conn = storage.connect(self.database)
+        try:
+            removed = conn.execute("DELETE FROM revoked_tokens WHERE expires_at < ?", (now,)).rowcount
+            conn.commit()
+            rows = conn.execute("SELECT id, jti FROM revoked_tokens").fetchall()
+        finally:
+            conn.close()
+        revoked = BloomFilter(self.capacity, self.error_rate)
+        for _, jti in rows:
+            revoked.add(jti)
+        with self._lock:
+            self._revoked = revoked
+            self._last_id = max([row_id for row_id, _ in rows] + [self._last_id])
+            self._refreshed_at = time.time()
+        return removed
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot['cached'] = len(self._cache)
+            snapshot['revoked'] = self._revoked.count
+        return snapshot
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the revoked token table")
+    parser.add_argument('command', choices=['purge'], help="drop revocations whose tokens have expired")
+    parser.add_argument('database', nargs='?', default='bank.db')
+    args = parser.parse_args()
+
+    removed = TokenService(None, args.database, purge_interval=None).purge()
+    print(f"Purged {removed} expired revocations.")
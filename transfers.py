@@ -0,0 +1,144 @@
+import random
+import sqlite3
+import threading
+import time
+
+from postings import AccountNotFound, InsufficientFunds, PostingError, credit, debit, balance
+
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+
+def is_busy(exc):
+    """True if a sqlite3 error means another connection holds the lock"""
+    if not isinstance(exc, sqlite3.OperationalError):
+        return False
+    code = getattr(exc, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (SQLITE_BUSY, SQLITE_LOCKED)
+    message = str(exc)
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+class RetriesExhausted(Exception):
+    """The write lock stayed busy through every retry"""
+
+
+class TransferEngine:
+    """Atomic transfers with a conditional debit and busy retries.
+
+    The sufficient-funds check is the WHERE clause of the debit UPDATE, so
+    there is no read-then-write window. Transactions start with BEGIN
+    IMMEDIATE, which takes SQLite's database-wide write lock up front, and
+    are retried with exponential backoff and jitter when SQLite reports
+    BUSY. Both balance rows are updated in account number order so every
+    transfer touches accounts in one consistent order.
+
+    configure() gives the connection a short busy_timeout, so a held lock
+    comes back as BUSY and is counted instead of being waited out inside
+    SQLite. Retries stop after `max_wait` seconds, well inside
+    write_pipeline.RESULT_TIMEOUT.
+    """
+
+    def __init__(self, max_retries=20, backoff=0.005, max_backoff=0.25, busy_timeout=0.02, max_wait=10.0):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.busy_timeout = busy_timeout
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._metrics = {
+            'transfers': 0,
+            'insufficient_funds': 0,
+            'conflicts': 0,
+            'retries': 0,
+            'retries_exhausted': 0,
+            'lock_wait_seconds_total': 0.0,
+        }
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._metrics[key] += n
+
+    def _sleep(self, attempt):
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def configure(self, conn):
+        """Make a held write lock fail fast so begin() sees and counts it"""
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        return conn
+
+    def begin(self, conn):
+        """BEGIN IMMEDIATE, backing off while another writer holds the lock"""
+        started = time.monotonic()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    return
+                except sqlite3.OperationalError as e:
+                    if not is_busy(e):
+                        raise
+                    self._count('conflicts')
+                    if attempt == self.max_retries or time.monotonic() - started >= self.max_wait:
+                        self._count('retries_exhausted')
+                        raise RetriesExhausted(f"Write lock busy after {attempt} retries") from e
+                    self._count('retries')
+                    self._sleep(attempt)
+        finally:
+            self._count('lock_wait_seconds_total', time.monotonic() - started)
+
+    def apply(self, conn, from_account, to_account, amount):
+        """Move amount paise inside the caller's open transaction.
+
+        Returns the sender's new balance.
+        """
+        if from_account == to_account:
+            raise PostingError("Cannot transfer to your own account")
+        if balance(conn, to_account) is None:
+            raise AccountNotFound("Recipient account not found")
+        try:
+            for account in sorted((from_account, to_account)):
+                if account == from_account:
+                    debit(conn, from_account, amount)
+                else:
+                    credit(conn, to_account, amount, "Recipient account not found")
+        except InsufficientFunds:
+            self._count('insufficient_funds')
+            raise
+        sender_balance = balance(conn, from_account)
+        conn.execute('''INSERT INTO transactions (account_number, type, amount, related_account, running_balance)
+                        VALUES (?, 'Transfer Sent', ?, ?, ?)''',
+                     (from_account, amount, to_account, sender_balance))
+        conn.execute('''INSERT INTO transactions (account_number, type, amount, related_account, running_balance)
+                        VALUES (?, 'Transfer Received', ?, ?, ?)''',
+                     (to_account, amount, from_account, balance(conn, to_account)))
+        self._count('transfers')
+        return sender_balance
+
+    def transfer(self, conn, from_account, to_account, amount):
+        """Run one transfer in its own transaction on an autocommit connection"""
+        self.configure(conn)
+        for attempt in range(self.max_retries + 1):
+            self.begin(conn)
+            try:
+                new_balance = self.apply(conn, from_account, to_account, amount)
+                conn.execute("COMMIT")
+                return new_balance
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                if not is_busy(e) or attempt == self.max_retries:
+                    raise
+                self._count('conflicts')
+                self._count('retries')
+                self._sleep(attempt)
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        with self._lock:
+            return dict(self._metrics)
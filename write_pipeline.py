@@ -0,0 +1,196 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import storage
+from postings import PostingFailed, post_deposit, post_withdrawal
+from transfers import RetriesExhausted, TransferEngine
+
+# Seconds a caller waits for its posting before giving up
+RESULT_TIMEOUT = 30.0
+
+# Failures that say nothing about the posting itself; callers see them as
+# PostingFailed so every `except PostingError` handles them
+STORAGE_ERRORS = (sqlite3.Error, OverflowError, RetriesExhausted)
+
+
+def _failed(exc):
+    failure = PostingFailed("The transaction could not be saved. Please try again.")
+    failure.__cause__ = exc
+    return failure
+
+
+class PostingFuture(Future):
+    """Future whose result() gives up after RESULT_TIMEOUT"""
+
+    def result(self, timeout=RESULT_TIMEOUT):
+        try:
+            return super().result(timeout)
+        except FutureTimeout:
+            # The posting may still commit later, so don't invite a blind retry
+            raise PostingFailed("The transaction is taking too long. Check your balance before retrying.") from None
+
+
+class WritePipeline:
+    """Single writer thread that commits queued postings in groups.
+
+    Callers submit a posting and get a Future. The writer drains up to
+    `max_batch` postings, waiting at most `max_latency` seconds after the
+    first one, and commits them in one transaction (one fsync). Each
+    posting runs under its own savepoint, so a rejected posting only fails
+    its own Future. Futures resolve after the commit; storage errors
+    resolve them with PostingFailed, and postings still queued when the
+    writer exits are failed rather than left waiting.
+    """
+
+    def __init__(self, database, max_batch=256, max_latency=0.002, profile=None,
+                 transfer_engine=None, factory=sqlite3.Connection):
+        self.database = database
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.profile = profile
+        self.transfer_engine = transfer_engine or TransferEngine()
+        self.factory = factory
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._metrics = {
+            'postings': 0,
+            'rejected': 0,
+            'batches': 0,
+            'batch_size_max': 0,
+            'commit_seconds_total': 0.0,
+        }
+        atexit.register(self.stop)
+
+    def start(self):
+        with self._lock:
+            # Threads don't survive fork, so a forked worker starts its own
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # A forked child must not replay postings queued in its parent;
+                # a restart in the same process keeps what is still queued
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='write-pipeline', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Flush queued postings and stop the writer"""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def submit(self, operation, *args):
+        """Queue operation(conn, *args) for the next group commit"""
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            self.start()
+        future = PostingFuture()
+        self._queue.put((operation, args, future))
+        return future
+
+    def deposit(self, account_number, amount):
+        return self.submit(post_deposit, account_number, amount)
+
+    def withdraw(self, account_number, amount):
+        return self.submit(post_withdrawal, account_number, amount)
+
+    def transfer(self, from_account, to_account, amount):
+        return self.submit(self.transfer_engine.apply, from_account, to_account, amount)
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None, True
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        try:
+            conn = storage.connect(self.database, self.profile, isolation_level=None, factory=self.factory)
+            self.transfer_engine.configure(conn)
+            try:
+                stopping = False
+                while not stopping:
+                    batch, stopping = self._next_batch()
+                    if batch:
+                        self._commit_batch(conn, batch)
+            finally:
+                conn.close()
+        finally:
+            self._fail_pending()
+
+    def _fail_pending(self):
+        """Fail everything still queued once the writer has exited"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[2].set_exception(PostingFailed("The write pipeline has stopped. Please try again."))
+
+    def _commit_batch(self, conn, batch):
+        started = time.monotonic()
+        outcomes = []
+        try:
+            self.transfer_engine.begin(conn)
+            for operation, args, future in batch:
+                conn.execute("SAVEPOINT posting")
+                try:
+                    outcomes.append((future, True, operation(conn, *args)))
+                    conn.execute("RELEASE posting")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO posting")
+                    conn.execute("RELEASE posting")
+                    outcomes.append((future, False, _failed(e) if isinstance(e, STORAGE_ERRORS) else e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            failure = _failed(e) if isinstance(e, STORAGE_ERRORS) else e
+            for _, _, future in batch:
+                future.set_exception(failure)
+            return
+
+        with self._lock:
+            self._metrics['batches'] += 1
+            self._metrics['postings'] += len(batch)
+            self._metrics['rejected'] += sum(1 for _, ok, _ in outcomes if not ok)
+            self._metrics['batch_size_max'] = max(self._metrics['batch_size_max'], len(batch))
+            self._metrics['commit_seconds_total'] += time.monotonic() - started
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+        batches = snapshot['batches']
+        snapshot['batch_size_avg'] = snapshot['postings'] / batches if batches else 0.0
+        snapshot['queued'] = self._queue.qsize()
+        snapshot['transfer_engine'] = self.transfer_engine.stats()
+        return snapshot